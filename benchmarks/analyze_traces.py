@@ -0,0 +1,96 @@
+import argparse
+import glob
+import json
+import sys
+from collections import defaultdict
+
+from _util import percentile
+
+# Summarizes per-tweet traces (TRACE_ENABLED=true writes them to DATA_DIR/traces.jsonl):
+# count, p50/p95/p99 and max duration per stage, plus total time per tweet and
+# tweet-to-post lag. With --baseline, each percentile is compared to another set of
+# traces, ie: the previous release.
+#
+# fetch is the timeline poll that found the tweet (one poll can find several tweets), or
+# a TweetDetail call for tweets queued before a restart. The poll runs before the trace
+# opens, so it is not part of total.
+#
+#   python benchmarks/analyze_traces.py data/traces.jsonl*
+#   python benchmarks/analyze_traces.py new/traces.jsonl* --baseline old/traces.jsonl*
+
+
+def load(paths: list[str], by_kind: bool) -> tuple[dict, dict, int]:
+    # Returns ({stage: [seconds]}, {outcome: count}, bytes moved)
+    stages = defaultdict(list)
+    outcomes = defaultdict(int)
+    moved = 0
+    for pattern in paths:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            with open(path, "r", encoding="utf-8") as f:
+                for line_no, line in enumerate(f, 1):
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        print(f"{path}:{line_no}: skipping malformed line", file=sys.stderr)
+                        continue
+                    outcomes[record.get("outcome", "ok")] += 1
+                    stages["total"].append(record.get("duration", 0))
+                    if "lag" in record:
+                        stages["lag"].append(record["lag"])
+                    for span in record.get("spans", []):
+                        name = span["name"]
+                        kind = span.get("media_type") or span.get("kind")
+                        if by_kind and kind:
+                            name = f"{name}:{kind}"
+                        stages[name].append(span.get("duration", 0))
+                        moved += span.get("bytes") or 0
+    return stages, outcomes, moved
+
+
+def summarize(stages: dict) -> dict:
+    return {
+        name: {
+            "count": len(values),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+            "max": max(values),
+        }
+        for name, values in stages.items() if values
+    }
+
+
+def change(new: float, old: float | None) -> str:
+    if not old:
+        return ""
+    return f" ({(new - old) / old * 100:+.0f}%)"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage latency percentiles from trace files")
+    parser.add_argument("paths", nargs="+", help="trace files or glob patterns")
+    parser.add_argument("--baseline", nargs="+", help="trace files to compare against")
+    parser.add_argument("--by-kind", action="store_true", help="split stages by media type / post kind")
+    args = parser.parse_args()
+
+    stages, outcomes, moved = load(args.paths, args.by_kind)
+    if not stages["total"]:
+        print("No traces found.")
+        return
+    summary = summarize(stages)
+    baseline = summarize(load(args.baseline, args.by_kind)[0]) if args.baseline else {}
+
+    print(f"{sum(outcomes.values())} trace(s): "
+          + ", ".join(f"{count} {outcome}" for outcome, count in sorted(outcomes.items()))
+          + f"; {moved / 1e6:.1f} MB moved")
+    print(f"{'stage':<22} {'count':>6} {'p50':>16} {'p95':>16} {'p99':>16} {'max':>9}")
+    order = ["fetch", "download", "upload", "translate", "post", "reply", "total", "lag"]
+    for name in sorted(summary, key=lambda n: (order.index(n.split(":")[0]) if n.split(":")[0] in order else len(order), n)):
+        row = summary[name]
+        old = baseline.get(name, {})
+        cells = [f"{row[p]:.3f}s{change(row[p], old.get(p))}" for p in ("p50", "p95", "p99")]
+        print(f"{name:<22} {row['count']:>6} {cells[0]:>16} {cells[1]:>16} {cells[2]:>16} {row['max']:>8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _util import peak_rss_mb, percentile
+from fake_twitter import FakeTwitter
+from fake_xrpc import start_server
+
+# End-to-end throughput of the bot with no real accounts: tweety's TwitterAsync is
+# replaced by fake_twitter.FakeTwitter and Bluesky by fake_xrpc (with injectable latency,
+# errors and rate limits). Two modes:
+#
+#   process  calls process_tweet directly, --concurrency at a time
+#   monitor  runs monitor_tweets (pollers, outbox workers) until every tweet is posted;
+#            latency is measured from the tweet becoming visible to its post being indexed
+#
+# Reports tweets/min, p50/p99 latency and peak RSS. --json writes the results to a file,
+# and --max-p99/--min-tpm turn them into a pass/fail exit code for CI.
+#
+#   python benchmarks/bench_end_to_end.py --mode monitor --targets 3 --tweets 50 --latency 0.02
+#   python benchmarks/bench_end_to_end.py --mode process --tweets 200 --video-mb 20 --in-memory
+
+
+def parse_mix(value: str) -> dict:
+    # "text:50,image:35,video:15"
+    mix = {}
+    for part in value.split(","):
+        kind, _, weight = part.partition(":")
+        mix[kind.strip()] = float(weight or 1)
+    return mix
+
+
+def configure_env(args, data_dir: str, targets: list[str]) -> None:
+    # Set before main is imported: it reads DATA_DIR and .env at import time. Values set
+    # here win over a local .env, which load_dotenv never overrides.
+    os.environ.update({
+        "DATA_DIR": data_dir,
+        "TARGET_USER": ",".join(targets),
+        "CHECK_INTERVAL": str(args.check_interval),
+        "CATCH_UP": "true",
+        "MAX_POSTS_PER_CYCLE": str(args.tweets),
+        "OUTBOX_WORKERS": str(args.workers),
+        "MAX_CONCURRENT_REQUESTS": str(args.concurrency),
+        "TWITTER_RATE_LIMIT": "1000000",
+        "BLUESKY_RATE_LIMIT": str(args.bluesky_budget),
+        "IN_MEMORY_MEDIA": "true" if args.in_memory else "false",
+        "ADAPTIVE_POLLING": "false",
+        "ENABLE_TRANSLATION": "false",
+        "AUTO_UPDATE": "false",
+        "METRICS_PORT": "",
+        "TRACE_ENABLED": "true" if args.trace else "false",
+        "MENTIONS_FILE": os.path.join(data_dir, "mentions.json"),
+    })
+
+
+async def make_client(base_url: str):
+    import ratelimit
+    from atproto import AsyncClient
+
+    client = AsyncClient(base_url=base_url)
+    ratelimit.install_httpx_hooks(client.request._client, "bluesky")
+    await client.login("bench.bsky.social", "password")
+    return client
+
+
+async def run_process(args, fake: FakeTwitter, base_url: str, targets: list[str]) -> dict:
+    import main
+
+    client = await make_client(base_url)
+    config = main.load_config()
+    tweets = [fake.make_tweet(targets[i % len(targets)]) for i in range(args.tweets * len(targets))]
+    latencies = []
+    failures = 0
+    slots = asyncio.Semaphore(args.concurrency)
+
+    async def one(tweet):
+        nonlocal failures
+        async with slots:
+            start = time.perf_counter()
+            try:
+                await main.process_tweet(tweet, client, config)
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(t) for t in tweets))
+    return {"elapsed": time.perf_counter() - start, "latencies": latencies, "failures": failures}
+
+
+async def run_monitor(args, fake: FakeTwitter, base_url: str, targets: list[str]) -> dict:
+    import main
+    import store
+
+    main.init_env_watch()
+    config = main.load_config()
+    store.init_store(main.STORE_FILE)
+    for target in targets:
+        # A watermark of 0 makes every fake tweet "new", so the whole backlog is posted
+        store.set_last_tweet_id(target, 0)
+    main.configure_rate_limits(config)
+
+    shared = main.build_shared(config, fake, await make_client(base_url))
+
+    total = fake.total(len(targets))
+    start = time.perf_counter()
+    deadline = time.monotonic() + args.timeout
+    task = asyncio.create_task(main.monitor_tweets(shared))
+    latencies = {}
+    while len(latencies) < total and time.monotonic() < deadline and not task.done():
+        await asyncio.sleep(0.2)
+        for tweet_id, published in list(fake.published_at.items()):
+            if tweet_id in latencies:
+                continue
+            row = store.get_tweet(tweet_id)
+            if row and row["status"] == store.STATUS_POSTED:
+                posted = datetime.fromisoformat(row["updated_at"]).timestamp()
+                latencies[tweet_id] = max(0.0, posted - published)
+    elapsed = time.perf_counter() - start
+
+    main.shutdown_flag = True
+    await task
+    depth = store.outbox_depth()
+    return {
+        "elapsed": elapsed,
+        "latencies": list(latencies.values()),
+        "failures": depth["dead"],
+        "unposted": total - len(latencies),
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Offline end-to-end throughput benchmark")
+    parser.add_argument("--mode", choices=["process", "monitor"], default="monitor")
+    parser.add_argument("--targets", type=int, default=2, help="number of fake target accounts")
+    parser.add_argument("--tweets", type=int, default=30, help="tweets per target")
+    parser.add_argument("--rate", type=float, default=0, help="tweets/min per target (0: all at once)")
+    parser.add_argument("--mix", default="text:50,image:35,video:15", help="media mix weights")
+    parser.add_argument("--image-kb", type=int, default=300)
+    parser.add_argument("--video-mb", type=float, default=5)
+    parser.add_argument("--long-text-rate", type=float, default=0.1, help="share of tweets over 300 graphemes")
+    parser.add_argument("--twitter-latency", type=float, default=0.05, help="seconds per fake Twitter call")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per fake XRPC request")
+    parser.add_argument("--bandwidth-mb", type=float, default=0, help="fake XRPC upload bandwidth in MB/s (0: unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of uploadBlob/createRecord calls failing with 500")
+    parser.add_argument("--ratelimit", type=int, default=0, help="fake XRPC requests allowed per window (0: unlimited)")
+    parser.add_argument("--ratelimit-window", type=int, default=300)
+    parser.add_argument("--bluesky-budget", type=int, default=3000, help="BLUESKY_RATE_LIMIT for the governor")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=2, help="outbox workers (monitor mode)")
+    parser.add_argument("--check-interval", type=int, default=1)
+    parser.add_argument("--in-memory", action="store_true", help="IN_MEMORY_MEDIA=true")
+    parser.add_argument("--trace", action="store_true", help="write per-tweet traces to the data dir")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--max-p99", type=float, help="fail if p99 latency (seconds) is above this")
+    parser.add_argument("--min-tpm", type=float, help="fail if tweets/min is below this")
+    parser.add_argument("--verbose", action="store_true", help="show the bot's own output")
+    args = parser.parse_args()
+
+    server, base_url = start_server(
+        latency=args.latency,
+        bandwidth=args.bandwidth_mb * 1024 * 1024 if args.bandwidth_mb else None,
+        error_rate=args.error_rate,
+        ratelimit=args.ratelimit,
+        ratelimit_window=args.ratelimit_window,
+    )
+    data_dir = tempfile.mkdtemp(prefix="t2b-bench-")
+    targets = [f"bench_target{i + 1}" for i in range(args.targets)]
+    configure_env(args, data_dir, targets)
+    # Downloaded media is written to the working directory
+    os.chdir(data_dir)
+
+    fake = FakeTwitter(
+        tweets=args.tweets,
+        rate=args.rate,
+        mix=parse_mix(args.mix),
+        image_bytes=args.image_kb * 1024,
+        video_bytes=int(args.video_mb * 1024 * 1024),
+        long_text_rate=args.long_text_rate,
+        latency=args.twitter_latency,
+        media_base_url=base_url.rsplit("/xrpc", 1)[0],
+        page_size=max(20, args.tweets),
+    )
+
+    async def run():
+        import main
+        import media
+        import tracing
+        if args.trace:
+            tracing.configure(main.TRACE_FILE)
+        try:
+            runner = run_process if args.mode == "process" else run_monitor
+            return await runner(args, fake, base_url, targets)
+        finally:
+            tracing.shutdown()
+            media.shutdown_image_pool()
+            await media.close_http()
+
+    rss_before = peak_rss_mb()
+    output = sys.stdout if args.verbose else open(os.devnull, "w")
+    with contextlib.redirect_stdout(output):
+        result = asyncio.run(run())
+    server.shutdown()
+
+    latencies = result["latencies"]
+    posted = len(latencies)
+    tpm = posted / result["elapsed"] * 60 if result["elapsed"] else 0.0
+    summary = {
+        "mode": args.mode,
+        "targets": args.targets,
+        "tweets": args.tweets * args.targets,
+        "posted": posted,
+        "failed": result["failures"],
+        "unposted": result.get("unposted", 0),
+        "elapsed_s": round(result["elapsed"], 3),
+        "tweets_per_min": round(tpm, 1),
+        "latency_p50_s": round(percentile(latencies, 50), 3),
+        "latency_p99_s": round(percentile(latencies, 99), 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "rss_before_mb": round(rss_before, 1),
+        "xrpc_calls": dict(server.stats),
+        "twitter_calls": fake.calls,
+        "data_dir": data_dir,
+    }
+
+    print(f"{args.mode}: {posted}/{summary['tweets']} tweet(s) posted in {summary['elapsed_s']}s "
+          f"({summary['failed']} failed, {summary['unposted']} unposted)")
+    print(f"  throughput   {summary['tweets_per_min']} tweets/min")
+    print(f"  latency      p50 {summary['latency_p50_s']}s, p99 {summary['latency_p99_s']}s")
+    print(f"  peak RSS     {summary['peak_rss_mb']} MB (before run: {summary['rss_before_mb']} MB)")
+    print(f"  XRPC calls   {json.dumps(summary['xrpc_calls'])}")
+    if args.trace:
+        print(f"  traces       python benchmarks/analyze_traces.py {os.path.join(data_dir, 'traces.jsonl')}*")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+    failed = []
+    if args.max_p99 is not None and summary["latency_p99_s"] > args.max_p99:
+        failed.append(f"p99 latency {summary['latency_p99_s']}s > {args.max_p99}s")
+    if args.min_tpm is not None and tpm < args.min_tpm:
+        failed.append(f"throughput {summary['tweets_per_min']} < {args.min_tpm} tweets/min")
+    if failed:
+        print("FAILED: " + "; ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
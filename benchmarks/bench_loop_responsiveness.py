@@ -0,0 +1,75 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from atproto import AsyncClient, Client
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _util import percentile
+from fake_xrpc import start_server
+
+# Measures how late a 10 ms ticker coroutine wakes up while a large video blob is
+# uploaded, once with the old blocking Client and once with AsyncClient.
+#
+#   python benchmarks/bench_loop_responsiveness.py --size-mb 50 --bandwidth-mb 25
+
+TICK = 0.01
+
+
+async def ticker(lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+async def run(mode: str, base_url: str, data: bytes) -> dict:
+    lags = []
+    stop = asyncio.Event()
+    tick_task = asyncio.create_task(ticker(lags, stop))
+    await asyncio.sleep(0.1)
+
+    start = time.perf_counter()
+    if mode == "sync":
+        client = Client(base_url=base_url)
+        client.com.atproto.repo.upload_blob(data)
+    else:
+        client = AsyncClient(base_url=base_url)
+        await client.com.atproto.repo.upload_blob(data)
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await tick_task
+    return {
+        "mode": mode,
+        "upload_s": elapsed,
+        "ticks": len(lags),
+        "max_lag_ms": max(lags, default=0) * 1000,
+        "p99_lag_ms": percentile(lags, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Event loop lag during a large blob upload")
+    parser.add_argument("--size-mb", type=int, default=50)
+    parser.add_argument("--bandwidth-mb", type=float, default=25.0, help="simulated upload bandwidth in MB/s")
+    args = parser.parse_args()
+
+    server, base_url = start_server(bandwidth=args.bandwidth_mb * 1024 * 1024)
+    data = os.urandom(args.size_mb * 1024 * 1024)
+    try:
+        for mode in ("sync", "async"):
+            result = asyncio.run(run(mode, base_url, data))
+            print(
+                f"{result['mode']:>5}: upload {result['upload_s']:.2f}s, "
+                f"{result['ticks']} ticks, max lag {result['max_lag_ms']:.1f} ms, "
+                f"p99 lag {result['p99_lag_ms']:.1f} ms"
+            )
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
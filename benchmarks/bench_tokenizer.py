@@ -0,0 +1,110 @@
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import richtext
+
+# Compares richtext.tokenize (one scan that also cleans the text) with the previous regex
+# chain (three re.sub passes in clean_tweet_text, then re.split for hashtags in
+# build_post_text) over a synthetic tweet corpus. The two do not produce the same output:
+# the chain drops every link and only finds hashtags, while richtext expands t.co links
+# and also emits link and mention facets, so it does more work per tweet. The two are
+# timed in alternation, so load on the machine hits both alike.
+#
+#   python benchmarks/bench_tokenizer.py --tweets 100000
+
+
+WORDS = ["hola", "mundo", "the", "match", "today", "goal", "news", "café", "naïve", "🙂", "🇪🇸", "👩‍👩‍👧"]
+
+
+def make_corpus(count: int, seed: int = 1) -> list[tuple[str, dict]]:
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(count):
+        parts = ["RT @someone:"] if rng.random() < 0.2 else []
+        urls = {}
+        for _ in range(rng.randint(8, 40)):
+            roll = rng.random()
+            if roll < 0.08:
+                parts.append(f"#{rng.choice(WORDS)}{rng.randint(0, 99)}{rng.choice(['', '!', '.'])}")
+            elif roll < 0.13:
+                parts.append(f"@user_{rng.randint(0, 9999)}")
+            elif roll < 0.16:
+                short = f"https://t.co/{i:x}{len(urls)}"
+                urls[short] = f"https://example.com/articles/{i}/{len(urls)}"
+                parts.append(short)
+            elif roll < 0.18:
+                parts.append("\n")
+            else:
+                parts.append(rng.choice(WORDS) + ("  " if rng.random() < 0.05 else ""))
+        if rng.random() < 0.3:
+            parts.append(f"https://t.co/pic{i:x}")
+        corpus.append((" ".join(parts), urls))
+    return corpus
+
+
+def regex_chain(text: str, urls: dict) -> list:
+    # The previous implementation, kept verbatim for comparison
+    text = re.sub(r'https?://\S+', '', text)
+    text = re.sub(r'^RT ', '🔁 ', text)
+    text = re.sub(r'[ \t]{2,}', ' ', text).strip()
+    tokens = []
+    for part in re.split(r'(#[^\s#]+)', text):
+        if not part:
+            continue
+        if part.startswith('#'):
+            tag_value = part[1:].strip('.,!?:;')
+            tokens.append(("tag", part, tag_value) if tag_value else ("text", part, None))
+        else:
+            tokens.append(("text", part, None))
+    return tokens
+
+
+def richtext_tokens(text: str, urls: dict) -> list:
+    return richtext.tokenize(text, urls)
+
+
+def count_facets(func, corpus: list) -> int:
+    return sum(sum(1 for kind, _, _ in func(text, urls) if kind != "text") for text, urls in corpus)
+
+
+def time_once(func, corpus: list) -> float:
+    start = time.perf_counter()
+    for text, urls in corpus:
+        func(text, urls)
+    return time.perf_counter() - start
+
+
+def report(name: str, best: float, facets: int, tweets: int) -> None:
+    per_tweet = best / tweets * 1e6
+    per_facet = best / max(1, facets) * 1e6
+    print(f"{name:<14} {best:8.3f}s  {per_tweet:7.2f} µs/tweet  {facets} facet(s), {per_facet:.2f} µs/facet")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tweets", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.tweets)
+    size = sum(len(text) for text, _ in corpus)
+    print(f"Corpus: {len(corpus)} tweets, {size / 1e6:.1f}M characters (best of {args.repeat})")
+    old = new = float("inf")
+    for _ in range(args.repeat):
+        old = min(old, time_once(regex_chain, corpus))
+        new = min(new, time_once(richtext_tokens, corpus))
+    old_facets = count_facets(regex_chain, corpus)
+    new_facets = count_facets(richtext_tokens, corpus)
+    report("regex chain", old, old_facets, len(corpus))
+    report("richtext", new, new_facets, len(corpus))
+    # Below 1.00x per tweet means richtext is slower per tweet than the chain
+    print(f"Per tweet: {old / new:.2f}x, per facet: {(old / old_facets) / (new / new_facets):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _util import peak_rss_mb
+from fake_xrpc import start_server
+
+# Peak memory of uploading one large file to a local fake XRPC server, comparing
+# atproto's upload_blob(bytes) with media.upload_blob_streaming. Each mode runs in its
+# own subprocess so ru_maxrss is not polluted by the other run.
+#
+#   python benchmarks/bench_upload_memory.py --sizes 50 100
+
+
+def _current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except OSError:
+        return peak_rss_mb()
+
+
+async def _child(mode: str, base_url: str, path: str):
+    from atproto import AsyncClient
+    import media
+
+    client = AsyncClient(base_url=base_url)
+    await client.login("bench.bsky.social", "password")
+    before = _current_rss_mb()
+
+    if mode == "bytes":
+        with open(path, "rb") as f:
+            data = f.read()
+        response = await client.com.atproto.repo.upload_blob(data)
+    else:
+        response = await media.upload_blob_streaming(client, path, "video/mp4")
+    await media.close_http()
+
+    print(f"{before:.1f} {peak_rss_mb():.1f} {response.blob.size}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak memory of blob uploads")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 100], help="file sizes in MB")
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "BASE_URL", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        asyncio.run(_child(*args.child))
+        return
+
+    server, base_url = start_server()
+    try:
+        for size_mb in args.sizes:
+            with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as f:
+                for _ in range(size_mb):
+                    f.write(os.urandom(1024 * 1024))
+                path = f.name
+            try:
+                for mode in ("bytes", "stream"):
+                    out = subprocess.run(
+                        [sys.executable, os.path.abspath(__file__), "--child", mode, base_url, path],
+                        capture_output=True, text=True, check=True,
+                    ).stdout.split()
+                    before, peak, uploaded = float(out[0]), float(out[1]), int(out[2])
+                    print(
+                        f"{size_mb:>4} MB {mode:>6}: baseline {before:.1f} MB, peak {peak:.1f} MB, "
+                        f"growth {peak - before:.1f} MB ({uploaded} bytes uploaded)"
+                    )
+            finally:
+                os.remove(path)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Local stand-in for the RapidAPI translator. Point the bot at it with
+# TRANSLATION_API_URL=<url printed by start_server>. Replies "[to] <query>".
+
+
+class FakeTranslatorHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        latency = self.server.options.get("latency", 0)
+        if latency:
+            time.sleep(latency)
+        with self.server.stats_lock:
+            self.server.stats["requests"] = self.server.stats.get("requests", 0) + 1
+
+        query = parse_qs(urlparse(self.path).query)
+        text = query.get("query", [""])[0]
+        to_lang = query.get("to", ["en"])[0]
+        data = json.dumps({"translation": f"[{to_lang}] {text}"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_server(**options) -> tuple[ThreadingHTTPServer, str]:
+    # Options: latency (seconds per request)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeTranslatorHandler)
+    server.daemon_threads = True
+    server.options = options
+    server.stats = {}
+    server.stats_lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return server, f"http://{host}:{port}/external-api/free-google-translator"
@@ -0,0 +1,139 @@
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+
+from fake_xrpc import fake_media
+
+# Stand-in for tweety's TwitterAsync, implementing what the bot calls: get_user_info,
+# get_tweets and tweet_detail. Every target publishes `tweets` tweets, either all at
+# once or at `rate` tweets per minute, with a configurable mix of text-only, image and
+# video tweets. Media is written locally by download() or, for the in-memory pipeline,
+# served by the fake XRPC server at media_base_url.
+
+WORDS = ["hola", "mundo", "golazo", "match", "today", "news", "café", "🙂", "🇪🇸", "#futbol", "#news", "@someone"]
+FIRST_ID = 1_800_000_000_000_000_000
+
+
+class FakeUser:
+    def __init__(self, user_id: int, username: str):
+        self.id = user_id
+        self.username = username
+        self.name = username.title()
+
+
+class FakeMedia:
+    def __init__(self, kind: str, size: int, base_url: str | None, latency: float):
+        self.type = "video" if kind == "video" else "photo"
+        self.kind = kind
+        self.size = size
+        self.latency = latency
+        self.url = f"{base_url}/media/{kind}/{size}" if base_url else None
+        self.media_url_https = self.url
+
+    async def best_stream(self):
+        return self
+
+    async def download(self, filename: str) -> str:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        data = fake_media(self.kind, self.size)
+        await asyncio.to_thread(_write, filename, data)
+        return filename
+
+
+def _write(path: str, data: bytes) -> None:
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+class FakeTweet:
+    def __init__(self, tweet_id: int, text: str, author: FakeUser, media: list):
+        self.id = tweet_id
+        self.text = text
+        self.author = author
+        self.media = media
+        self.urls = []
+        self.replied_to = None
+        self.created_on = datetime.now(timezone.utc)
+
+
+class FakeTwitter:
+    def __init__(self, tweets: int = 100, rate: float = 0, mix: dict | None = None,
+                 image_bytes: int = 300_000, video_bytes: int = 5_000_000, max_images: int = 4,
+                 long_text_rate: float = 0.1, latency: float = 0.05, media_latency: float = 0.0,
+                 media_base_url: str | None = None, page_size: int = 20, seed: int = 1):
+        self.tweets_per_target = tweets
+        self.rate = rate
+        self.mix = mix or {"text": 50, "image": 35, "video": 15}
+        self.image_bytes = image_bytes
+        self.video_bytes = video_bytes
+        self.max_images = max_images
+        self.long_text_rate = long_text_rate
+        self.latency = latency
+        self.media_latency = media_latency
+        self.media_base_url = media_base_url
+        self.page_size = page_size
+        self.rng = random.Random(seed)
+        self.started = time.monotonic()
+        self.users: dict[str, FakeUser] = {}
+        self.timelines: dict[str, list[FakeTweet]] = {}
+        self.by_id: dict[int, FakeTweet] = {}
+        # tweet ID -> wall-clock time it became visible, for end-to-end latency
+        self.published_at: dict[int, float] = {}
+        self.calls = {"get_user_info": 0, "get_tweets": 0, "tweet_detail": 0}
+        self._next_id = FIRST_ID
+
+    def _text(self) -> str:
+        count = self.rng.randint(60, 120) if self.rng.random() < self.long_text_rate else self.rng.randint(5, 30)
+        return " ".join(self.rng.choice(WORDS) for _ in range(count))
+
+    def _media(self) -> list[FakeMedia]:
+        kind = self.rng.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        if kind == "image":
+            return [FakeMedia("image", self.image_bytes, self.media_base_url, self.media_latency)
+                    for _ in range(self.rng.randint(1, self.max_images))]
+        if kind == "video":
+            return [FakeMedia("video", self.video_bytes, self.media_base_url, self.media_latency)]
+        return []
+
+    def make_tweet(self, username: str) -> FakeTweet:
+        user = self.users.setdefault(username.lower(), FakeUser(len(self.users) + 1, username))
+        self._next_id += self.rng.randint(1, 1000)
+        tweet = FakeTweet(self._next_id, self._text(), user, self._media())
+        self.by_id[tweet.id] = tweet
+        self.published_at[tweet.id] = time.time()
+        return tweet
+
+    def _publish(self, username: str) -> list[FakeTweet]:
+        # Tweets become visible over time at `rate` per minute (all at once when rate is 0)
+        timeline = self.timelines.setdefault(username.lower(), [])
+        due = self.tweets_per_target
+        if self.rate:
+            due = min(due, int((time.monotonic() - self.started) * self.rate / 60) + 1)
+        while len(timeline) < due:
+            timeline.append(self.make_tweet(username))
+        return timeline
+
+    async def get_user_info(self, username: str) -> FakeUser:
+        self.calls["get_user_info"] += 1
+        await asyncio.sleep(self.latency)
+        self._publish(username)
+        return self.users[username.lower()]
+
+    async def get_tweets(self, user, pages: int = 1, replies: bool = False, **kwargs) -> list[FakeTweet]:
+        # Newest first, one page, like a profile timeline
+        self.calls["get_tweets"] += 1
+        await asyncio.sleep(self.latency)
+        username = user.username if isinstance(user, FakeUser) else next(
+            (u.username for u in self.users.values() if str(u.id) == str(user)), str(user)
+        )
+        return list(reversed(self._publish(username)[-self.page_size:]))
+
+    async def tweet_detail(self, tweet_id: str) -> FakeTweet:
+        self.calls["tweet_detail"] += 1
+        await asyncio.sleep(self.latency)
+        return self.by_id[int(tweet_id)]
+
+    def total(self, targets: int) -> int:
+        return self.tweets_per_target * targets
@@ -0,0 +1,192 @@
+import base64
+import hashlib
+import json
+import random
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+# Local stand-in for a Bluesky PDS. Implements just enough XRPC for the bot:
+# createSession, getProfile(s), uploadBlob and createRecord. Latency, errors and
+# rate limiting (ratelimit-* headers, then 429s) can be injected through start_server
+# options. GET /media/<image|video>/<bytes> serves generated media for fake tweets.
+
+FAKE_DID = "did:plc:fakebenchmarkuser"
+FAKE_HANDLE = "bench.bsky.social"
+
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _fake_jwt(scope: str) -> str:
+    # atproto only decodes the payload to read expiry, it never checks the signature
+    now = int(time.time())
+    header = _b64url(json.dumps({"alg": "HS256", "typ": "JWT"}).encode())
+    payload = _b64url(json.dumps({"scope": scope, "sub": FAKE_DID, "iat": now, "exp": now + 3600}).encode())
+    return f"{header}.{payload}.{_b64url(b'signature')}"
+
+
+def _fake_cid(digest: str) -> str:
+    # Not a real CID, but stable and shaped like one
+    return "bafkrei" + base64.b32encode(bytes.fromhex(digest)).decode().lower().rstrip("=")[:52]
+
+
+def fake_media(kind: str, size: int, width: int = 1200, height: int = 800) -> bytes:
+    # A PNG header (so the dimension probe succeeds) or an MP4 ftyp box, padded to size
+    if kind == "image":
+        header = b"\x89PNG\r\n\x1a\n" + struct.pack(">I4sII", 13, b"IHDR", width, height)
+    else:
+        header = struct.pack(">I4s4s", 16, b"ftyp", b"mp42") + b"\x00" * 4
+    return header + b"\x00" * max(0, size - len(header))
+
+
+class FakeXrpcHandler(BaseHTTPRequestHandler):
+    server_version = "FakeXrpc/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict, headers: dict | None = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, str(value))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _rate_limit(self) -> tuple[bool, dict]:
+        # Fixed window of ratelimit requests per ratelimit_window seconds, reported the
+        # way the real PDS does. Returns (allowed, headers).
+        limit = self.server.options.get("ratelimit")
+        if not limit:
+            return True, {}
+        window = self.server.options.get("ratelimit_window", 300)
+        with self.server.stats_lock:
+            now = time.time()
+            if now >= self.server.window_reset:
+                self.server.window_reset = now + window
+                self.server.window_used = 0
+            self.server.window_used += 1
+            used, reset = self.server.window_used, self.server.window_reset
+        headers = {
+            "ratelimit-limit": limit,
+            "ratelimit-remaining": max(0, limit - used),
+            "ratelimit-reset": int(reset),
+            "ratelimit-policy": f"{limit};w={window}",
+        }
+        return used <= limit, headers
+
+    def _count(self, key: str) -> None:
+        with self.server.stats_lock:
+            self.server.stats[key] = self.server.stats.get(key, 0) + 1
+
+    def _read_body(self) -> tuple[bytes, int, str]:
+        # Reads the request in chunks, sleeping to emulate the configured bandwidth.
+        # Only the first 4 KB is kept, so large uploads do not inflate the server's memory.
+        length = int(self.headers.get("Content-Length", 0))
+        bandwidth = self.server.options.get("bandwidth")
+        digest = hashlib.sha256()
+        head = b""
+        remaining = length
+        while remaining > 0:
+            chunk = self.rfile.read(min(65536, remaining))
+            if not chunk:
+                break
+            if len(head) < 4096:
+                head += chunk[:4096 - len(head)]
+            digest.update(chunk)
+            remaining -= len(chunk)
+            if bandwidth:
+                time.sleep(len(chunk) / bandwidth)
+        return head, length - remaining, digest.hexdigest()
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path.startswith("/media/"):
+            _, _, kind, size = path.split("/", 3)
+            data = fake_media(kind, int(size))
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png" if kind == "image" else "video/mp4")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        method = path.rsplit("/", 1)[-1]
+        if method == "app.bsky.actor.getProfile":
+            self._send_json(200, {"did": FAKE_DID, "handle": FAKE_HANDLE})
+        elif method == "app.bsky.actor.getProfiles":
+            # Every well-formed handle "exists", with a DID derived from it
+            actors = [v for k, v in parse_qsl(urlparse(self.path).query) if k == "actors"]
+            self._send_json(200, {"profiles": [
+                {"did": "did:plc:" + hashlib.sha256(a.encode()).hexdigest()[:24], "handle": a} for a in actors
+            ]})
+        else:
+            self._send_json(404, {"error": "MethodNotImplemented", "message": method})
+
+    def do_POST(self):
+        method = self.path.split("?", 1)[0].rsplit("/", 1)[-1]
+        head, size, digest = self._read_body()
+        options = self.server.options
+        latency = options.get("latency", 0)
+        if latency:
+            time.sleep(latency)
+        self._count(method)
+
+        allowed, headers = self._rate_limit()
+        if not allowed:
+            self._count("rate_limited")
+            self._send_json(429, {"error": "RateLimitExceeded", "message": "Rate Limit Exceeded"}, headers)
+            return
+        error_rate = options.get("error_rate", 0)
+        if error_rate and method in options.get("error_methods", ERROR_METHODS) and self.server.rng.random() < error_rate:
+            self._count("errors")
+            self._send_json(500, {"error": "InternalServerError", "message": "Injected error"}, headers)
+            return
+
+        if method == "com.atproto.server.createSession":
+            self._send_json(200, {
+                "did": FAKE_DID,
+                "handle": FAKE_HANDLE,
+                "accessJwt": _fake_jwt("com.atproto.access"),
+                "refreshJwt": _fake_jwt("com.atproto.refresh"),
+            })
+        elif method == "com.atproto.repo.uploadBlob":
+            self._send_json(200, {"blob": {
+                "$type": "blob",
+                "ref": {"$link": _fake_cid(digest)},
+                "mimeType": self.headers.get("Content-Type", "*/*"),
+                "size": size,
+            }}, headers)
+        elif method == "com.atproto.repo.createRecord":
+            self._send_json(200, {
+                "uri": f"at://{FAKE_DID}/app.bsky.feed.post/{digest[:13]}",
+                "cid": _fake_cid(digest),
+            }, headers)
+        else:
+            self._send_json(404, {"error": "MethodNotImplemented", "message": method})
+
+
+ERROR_METHODS = ("com.atproto.repo.uploadBlob", "com.atproto.repo.createRecord")
+
+
+def start_server(**options) -> tuple[ThreadingHTTPServer, str]:
+    # Options: latency (seconds per request), bandwidth (bytes/second for request bodies),
+    # error_rate (0-1, share of error_methods calls answered with a 500), ratelimit and
+    # ratelimit_window (requests allowed per window in seconds, then 429s), seed
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeXrpcHandler)
+    server.daemon_threads = True
+    server.options = options
+    server.stats = {}
+    server.stats_lock = threading.Lock()
+    server.rng = random.Random(options.get("seed", 1))
+    server.window_reset = 0.0
+    server.window_used = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address
+    return server, f"http://{host}:{port}/xrpc"
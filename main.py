@@ -1,6 +1,5 @@
 import asyncio
 import os
-import requests
 import time
 import re
 import logging
@@ -8,10 +7,23 @@ import signal
 import sys
 import threading
 import json
+import io
+import shutil
+import tempfile
+import contextlib
+import media
+import mentions
+import metrics
+import ratelimit
+import richtext
+import scheduler
+import store
+import tracing
+import translation
 from datetime import datetime, timezone
 from tweety import TwitterAsync
-from dotenv import load_dotenv
-from atproto import Client, SessionEvent, Session, client_utils, models
+from dotenv import dotenv_values, find_dotenv, load_dotenv
+from atproto import AsyncClient, SessionEvent, Session, client_utils, models
 from atproto_client.models.app.bsky.embed.video import Main as VideoEmbed
 from atproto_client.models.app.bsky.embed.defs import AspectRatio
 import http.client
@@ -25,7 +37,8 @@ except ImportError:
     _PIL_AVAILABLE = False
 
 # Load environment variables
-load_dotenv()
+ENV_FILE = find_dotenv() or ".env"
+load_dotenv(ENV_FILE)
 
 # Data directory for persistent files (used by Docker; default current dir)
 DATA_DIR = os.getenv("DATA_DIR", ".")
@@ -78,6 +91,17 @@ def signal_handler(sig, frame):
 # Register signal handler for Ctrl+C
 signal.signal(signal.SIGINT, signal_handler)
 
+# Set by SIGHUP: reload .env on the next supervisor tick even if the file looks unchanged
+_reload_requested = False
+
+
+def reload_signal_handler(sig, frame):
+    global _reload_requested
+    _reload_requested = True
+
+if hasattr(signal, "SIGHUP"):
+    signal.signal(signal.SIGHUP, reload_signal_handler)
+
 
 def _input_listener():
     # Background thread: type 'check' and press Enter to trigger an immediate update check
@@ -188,10 +212,18 @@ def parse_bool(value: str, default: bool = False) -> bool:
     return value.strip().lower() in ("1", "true", "yes", "on")
 
 STATE_FILE = os.path.join(DATA_DIR, "state.json")
+# How often the supervisor checks .env for changes and whether an update check is due
+CONFIG_CHECK_INTERVAL = 5
+# How often the remaining rate-limit budget is logged
+BUDGET_LOG_INTERVAL = 600
+# Seconds to let outbox workers finish their current post on shutdown
+OUTBOX_SHUTDOWN_TIMEOUT = 60
+STORE_FILE = os.path.join(DATA_DIR, "mirror.db")
+TRACE_FILE = os.path.join(DATA_DIR, "traces.jsonl")
 
 
 def get_default_state() -> dict:
-    return {"last_tweet_id": None, "last_update_check": None}
+    return {"last_update_check": None}
 
 
 def load_state() -> dict:
@@ -203,20 +235,76 @@ def load_state() -> dict:
 
 
 def save_state(state: dict) -> None:
-    with open(STATE_FILE, "w") as f:
+    # Write to a temp file, fsync, then rename over state.json, so a crash mid-write
+    # leaves either the old or the new file, never a truncated one
+    tmp_path = f"{STATE_FILE}.tmp"
+    with open(tmp_path, "w") as f:
         json.dump(state, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, STATE_FILE)
+    try:
+        dir_fd = os.open(os.path.dirname(os.path.abspath(STATE_FILE)), os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    except OSError:
+        # Not every platform can fsync a directory (e.g. Windows)
+        pass
+
+
+# Write-behind state: state.json is read once, kept in memory, and only written by
+# flush_state() at controlled points (after an update check, on shutdown).
+_state: dict | None = None
+_state_dirty = False
+
+
+def get_state() -> dict:
+    global _state
+    if _state is None:
+        _state = {**get_default_state(), **load_state()}
+    return _state
+
+
+def set_state_value(key: str, value) -> None:
+    global _state_dirty
+    state = get_state()
+    if state.get(key) != value:
+        state[key] = value
+        _state_dirty = True
+
 
+def flush_state() -> None:
+    global _state_dirty
+    if not _state_dirty:
+        return
+    try:
+        save_state(get_state())
+        _state_dirty = False
+    except Exception as e:
+        error(f"Failed to save state: {e}")
 
-def update_last_tweet_id(tweet_id) -> None:
-    state = load_state()
-    state["last_tweet_id"] = str(tweet_id)
-    save_state(state)
+
+def migrate_legacy_state(targets: list[dict]) -> None:
+    # Older versions kept last_tweet_id in state.json (top-level for TARGET_USER, or per
+    # target). Move it into the tweet index so an upgrade does not repost anything.
+    global _state_dirty
+    state = get_state()
+    legacy_id = state.pop("last_tweet_id", None)
+    legacy_targets = state.pop("targets", None) or {}
+    if legacy_id is None and not legacy_targets:
+        return
+    if legacy_id is not None and targets:
+        legacy_targets.setdefault(targets[0]["username"].lower(), {"last_tweet_id": legacy_id})
+    imported = store.import_state_targets(legacy_targets)
+    info(f"Migrated last_tweet_id for {imported} target(s) from state.json to the tweet index.")
+    _state_dirty = True
+    flush_state()
 
 
 def update_last_check_time() -> None:
-    state = load_state()
-    state["last_update_check"] = datetime.now(timezone.utc).isoformat()
-    save_state(state)
+    set_state_value("last_update_check", datetime.now(timezone.utc).isoformat())
 
 
 def _env_strip(key: str) -> str | None:
@@ -227,13 +315,65 @@ def _env_strip(key: str) -> str | None:
     return v if v else None
 
 
+def parse_targets(value: str | None, default_interval: int) -> list[dict]:
+    # Parse TARGET_USER as a comma-separated list, e.g. "userA, userB:60".
+    # An optional ":seconds" suffix overrides CHECK_INTERVAL for that target.
+    targets = []
+    seen = set()
+    if not value:
+        return targets
+    for item in value.split(","):
+        username, _, interval = item.strip().partition(":")
+        username = username.strip().lstrip("@")
+        if not username or username.lower() in seen:
+            continue
+        check_interval = default_interval
+        if interval.strip():
+            try:
+                check_interval = max(1, int(interval))
+            except ValueError:
+                warning(f"Invalid check interval '{interval}' for target '{username}', using {default_interval}.")
+        seen.add(username.lower())
+        targets.append({"username": username, "check_interval": check_interval})
+    return targets
+
+
 def load_config() -> dict:
+    check_interval = int(os.getenv("CHECK_INTERVAL", 300))
     return {
-        "target_username": _env_strip("TARGET_USER"),
-        "check_interval": int(os.getenv("CHECK_INTERVAL", 300)),
+        "targets": parse_targets(_env_strip("TARGET_USER"), check_interval),
+        "check_interval": check_interval,
+        "max_concurrent_requests": max(1, int(os.getenv("MAX_CONCURRENT_REQUESTS", 4))),
+        "catch_up": parse_bool(os.getenv("CATCH_UP"), default=True),
+        "max_posts_per_cycle": max(1, int(os.getenv("MAX_POSTS_PER_CYCLE", 5))),
+        "outbox_workers": max(1, int(os.getenv("OUTBOX_WORKERS", 2))),
+        "max_post_attempts": max(1, int(os.getenv("MAX_POST_ATTEMPTS", 5))),
+        "mirror_self_replies": parse_bool(os.getenv("MIRROR_SELF_REPLIES"), default=True),
+        "user_cache_ttl": float(os.getenv("USER_CACHE_TTL_HOURS", 24)) * 3600,
+        "mentions_file": _env_strip("MENTIONS_FILE") or os.path.join(DATA_DIR, "mentions.json"),
+        "mention_cache_ttl": float(os.getenv("MENTION_CACHE_TTL_HOURS", 168)) * 3600,
+        "mention_negative_ttl": float(os.getenv("MENTION_NEGATIVE_TTL_HOURS", 6)) * 3600,
+        "twitter_rate_limit": max(1, int(os.getenv("TWITTER_RATE_LIMIT", 50))),
+        "bluesky_rate_limit": max(1, int(os.getenv("BLUESKY_RATE_LIMIT", 3000))),
+        "adaptive_polling": parse_bool(os.getenv("ADAPTIVE_POLLING"), default=False),
+        "adaptive_min_interval": max(1, int(os.getenv("ADAPTIVE_MIN_INTERVAL", 60))),
+        "adaptive_max_interval": max(1, int(os.getenv("ADAPTIVE_MAX_INTERVAL", 3600))),
+        "max_concurrent_downloads": max(1, int(os.getenv("MAX_CONCURRENT_DOWNLOADS", 4))),
+        "media_download_timeout": float(os.getenv("MEDIA_DOWNLOAD_TIMEOUT", 120)),
+        "max_concurrent_uploads": max(1, int(os.getenv("MAX_CONCURRENT_UPLOADS", 4))),
+        "stream_uploads": parse_bool(os.getenv("STREAM_UPLOADS"), default=True),
+        "in_memory_media": parse_bool(os.getenv("IN_MEMORY_MEDIA"), default=False),
+        "prepare_images": parse_bool(os.getenv("PREPARE_IMAGES"), default=True),
+        "in_memory_video_max_bytes": int(float(os.getenv("IN_MEMORY_VIDEO_MAX_MB", 20)) * 1024 * 1024),
         "enable_translation": parse_bool(os.getenv("ENABLE_TRANSLATION"), default=False),
         "translation_from": os.getenv("TRANSLATION_FROM", "es"),
         "translation_to": os.getenv("TRANSLATION_TO", "en"),
+        "translation_cache_ttl": float(os.getenv("TRANSLATION_CACHE_TTL_DAYS", 30)) * 86400,
+        "trace_enabled": parse_bool(os.getenv("TRACE_ENABLED"), default=False),
+        "trace_max_bytes": int(float(os.getenv("TRACE_MAX_MB", 10)) * 1024 * 1024),
+        "trace_backups": max(0, int(os.getenv("TRACE_BACKUPS", 3))),
+        "metrics_port": int(os.getenv("METRICS_PORT") or 0),
+        "metrics_host": _env_strip("METRICS_HOST") or "127.0.0.1",
         "auto_update": parse_bool(os.getenv("AUTO_UPDATE"), default=True),
         "update_interval": int(os.getenv("UPDATE_CHECK_INTERVAL", 86400)),
         "twitter_cookies": _env_strip("TWITTER_COOKIES"),
@@ -243,8 +383,51 @@ def load_config() -> dict:
         "twitter_twid": _env_strip("TWITTER_TWID"),
         "twitter_username": _env_strip("TWITTER_USERNAME"),
         "twitter_password": _env_strip("TWITTER_PASSWORD"),
+        "translation_backend": _env_strip("TRANSLATION_BACKEND"),
+        "translation_api_url": _env_strip("TRANSLATION_API_URL"),
+        "translation_dictionary_file": _env_strip("TRANSLATION_DICTIONARY_FILE"),
+        "translator_rapidapi_key": _env_strip("TRANSLATOR_RAPIDAPI_KEY"),
     }
 
+
+# .env is only re-read when its inode/mtime/size change (or on SIGHUP), instead of
+# reparsing it and rewriting os.environ on every poll
+_env_signature = None
+_dotenv_keys: set = set()
+
+
+def _env_file_signature() -> tuple | None:
+    try:
+        st = os.stat(ENV_FILE)
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+def init_env_watch() -> None:
+    # Remember the .env state loaded at startup so the first check does not reload it
+    global _env_signature, _dotenv_keys
+    _env_signature = _env_file_signature()
+    _dotenv_keys = set(dotenv_values(ENV_FILE)) if _env_signature else set()
+
+
+def reload_env_if_changed(force: bool = False) -> bool:
+    # Apply .env to os.environ (overriding, like load_dotenv(override=True)) if it changed.
+    # Keys deleted from .env are removed from the environment too.
+    global _env_signature, _dotenv_keys
+    signature = _env_file_signature()
+    if not force and signature == _env_signature:
+        return False
+    _env_signature = signature
+    values = {}
+    if signature:
+        values = {k: v for k, v in dotenv_values(ENV_FILE).items() if v is not None}
+    for key in _dotenv_keys - values.keys():
+        os.environ.pop(key, None)
+    os.environ.update(values)
+    _dotenv_keys = set(values)
+    return True
+
 SESSION_FILE = os.path.join(DATA_DIR, "session.txt")
 
 
@@ -260,27 +443,33 @@ def save_session(session_string: str) -> None:
     with open(SESSION_FILE, "w") as f:
         f.write(session_string)
 
-def interruptible_sleep(seconds: int) -> None:
-    # Sleep for specified seconds, but check shutdown flag every second
-    for _ in range(seconds):
+async def interruptible_sleep(seconds: int) -> None:
+    # Sleep for specified seconds, but check shutdown flag every second.
+    # Uses asyncio.sleep so other targets keep polling while this one waits.
+    for _ in range(int(seconds)):
         if shutdown_flag:
             break
-        time.sleep(1)
+        await asyncio.sleep(1)
 
-def on_session_change(event: SessionEvent, session: Session) -> None:
+async def on_session_change(event: SessionEvent, session: Session) -> None:
     if event in (SessionEvent.CREATE, SessionEvent.REFRESH):
         info(f'Session changed: {event} {repr(session)}')
         save_session(session.export())
 
-def init_bluesky_client() -> Client:
-    client = Client()
+async def init_bluesky_client() -> AsyncClient:
+    # AsyncClient keeps one pooled HTTP connection, so uploads and posts never block the event loop
+    client = AsyncClient()
     client.on_session_change(on_session_change)
+    # Route every XRPC call through the Bluesky rate-limit governor (atproto keeps its
+    # httpx.AsyncClient on request._client)
+    if not ratelimit.install_httpx_hooks(getattr(getattr(client, "request", None), "_client", None), "bluesky"):
+        warning("Could not attach the rate-limit governor to the Bluesky client.")
 
     session_string = get_session()
     if session_string:
         process('Reusing session')
         try:
-            client.login(session_string=session_string)
+            await client.login(session_string=session_string)
             return client
         except Exception as e:
             warning(f"Failed to reuse session: {e}")    
@@ -293,103 +482,141 @@ def init_bluesky_client() -> Client:
         error(error_message)
         raise ValueError(error_message)
 
-    client.login(bluesky_username, bluesky_password)
+    await client.login(bluesky_username, bluesky_password)
 
     return client
 
-def clean_tweet_text(text: str) -> str:
-    # Remove HTTP/HTTPS links (like t.co links)
-    text = re.sub(r'https?://\S+', '', text)
-    # Replace 'RT ' at the beginning with '🔁'
-    text = re.sub(r'^RT ', '🔁 ', text)
-    # Clean up any residual double spaces (not touching newlines)
-    text = re.sub(r'[ \t]{2,}', ' ', text).strip()
-    return text
-
-def translate_text(text: str, enable_translation: bool, from_lang: str, to_lang: str) -> str:
-    # Translate one language text to another language using RapidAPI Free Google Translator
+def tweet_url_map(tweet) -> dict[str, str]:
+    # t.co link -> expanded URL, from the tweet's URL entities
+    urls = {}
+    for entity in getattr(tweet, "urls", None) or []:
+        if isinstance(entity, dict):
+            short, expanded = entity.get("url"), entity.get("expanded_url")
+        else:
+            short, expanded = getattr(entity, "url", None), getattr(entity, "expanded_url", None)
+        if short and expanded:
+            urls[short] = expanded
+    return urls
+
+async def translate_text(text: str, enable_translation: bool, from_lang: str, to_lang: str,
+                         config: dict | None = None) -> str:
+    # Translate one language text to another language using the configured backend
+    # (RapidAPI Free Google Translator by default, see translation.py)
     if not enable_translation:
         return None
-    
+
+    # config supplies the backend settings and cache TTL; loaded from .env when not given
+    config = config or load_config()
+    # Identical text is translated once; repeats come from the in-memory/SQLite cache
+    cached = translation.get_cached(text, from_lang, to_lang, config["translation_cache_ttl"])
+    if cached is not None:
+        info(f"Using cached translation. {translation.stats_summary()}")
+        return cached
+
     try:
-        url = "https://free-google-translator.p.rapidapi.com/external-api/free-google-translator"
-        
-        querystring = {"from": from_lang, "to": to_lang, "query": text}
-        payload = {"translate": "rapidapi"}
-        
-        translator_api_key = os.getenv("TRANSLATOR_RAPIDAPI_KEY")
-        if not translator_api_key:
-            error("TRANSLATOR_RAPIDAPI_KEY is not set.")
-            return None
-
-        headers = {
-            "x-rapidapi-key": translator_api_key,
-            "x-rapidapi-host": "free-google-translator.p.rapidapi.com",
-            "Content-Type": "application/json"
-        }
-        
-        response = requests.post(url, json=payload, headers=headers, params=querystring, timeout=15)
-        if response.status_code == 200:
-            result = response.json()
-            translated = result.get("translation", "")
-            success(f"Translated text: {translated}")
-            return translated
-        else:
-            warning(f"Translation API returned status code {response.status_code}")
-            return None
+        with metrics.stage("translate"), tracing.span("translate", chars=len(text)):
+            translated = await translation.get_backend(config).translate(text, from_lang, to_lang)
+    except translation.TranslationError as e:
+        warning(str(e))
+        return None
     except Exception as e:
         error(f"Failed to translate text: {e}")
         return None
 
-def send_translation_reply(bluesky_client, original_post, translated_text: str):
-    # Send a translation as a reply to the original post
+    if translated:
+        success(f"Translated text: {translated}")
+        translation.put_cached(text, from_lang, to_lang, translated)
+    info(translation.stats_summary())
+    return translated
+
+async def send_translation_reply(bluesky_client, original_post, translated_text: str, root_post=None):
+    # Send a translation as a reply to the original post. root_post is the thread root
+    # when the original post is itself a reply; otherwise the original post is the root.
     try:
-        # Create a strong reference to the original post
-        post_ref = models.create_strong_ref(original_post)
-        
-        # Build text builder to parse hashtags in translation
-        builder = build_post_text(f"Translation: {translated_text}")
-        
-        # Create the reply with parent and root pointing to the original post
-        reply = bluesky_client.send_post(
-            text=builder,
-            reply_to=models.AppBskyFeedPost.ReplyRef(parent=post_ref, root=post_ref)
-        )
-        success(f"Posted translation reply. Response: {reply}")
-        return reply
+        # Validated up front; a long translation becomes its own short reply chain
+        builders = build_thread(richtext.tokenize(f"Translation: {translated_text}"))
+        replies = await send_reply_chain(bluesky_client, original_post, builders, root_post, kind="translation")
+        success(f"Posted translation reply. Response: {replies[0]}")
+        return replies[0]
     except Exception as e:
         error(f"Failed to post translation reply: {e}")
         return None
 
-def build_post_text(tweet_text: str) -> client_utils.TextBuilder:
+def route_mentions(tokens: list) -> list:
+    # Mapped accounts become real mentions (DIDs are resolved ahead of time by
+    # mentions.refresh), shown with their Bluesky handle; anything else links to the X
+    # profile. Done before splitting, so posts are measured with the text they will carry.
+    routed = []
+    for kind, display, value in tokens:
+        if kind == "mention":
+            route = mentions.lookup(value)
+            if route:
+                routed.append(("mention", f"@{route[0]}", route[1]))
+            else:
+                routed.append(("link", display, f"https://x.com/{value}"))
+        else:
+            routed.append((kind, display, value))
+    return routed
+
+def build_post_text(tokens: list) -> client_utils.TextBuilder:
+    # The text builder tracks UTF-8 byte offsets as tokens are appended, so every facet
+    # lines up with the encoded text
     builder = client_utils.TextBuilder()
-    
-    # Split the text using regex to find hashtags, preserving the rest of the text
-    # Pattern explanation: matches `#` followed by word characters or supported punctuation
-    # and keeps the delimiters in the split result.
-    parts = re.split(r'(#[^\s#]+)', tweet_text)
-    
-    for part in parts:
-        if not part:
-            continue
-        if part.startswith('#'):
+    for kind, display, value in tokens:
+        if kind == "tag":
             # The atproto text builder expects the tag value without the hashtag
-            tag_value = part[1:].strip('.,!?:;')
-            if tag_value:
-                builder.tag(part, tag_value)
-            else:
-                builder.text(part)
+            builder.tag(display, value)
+        elif kind == "link":
+            builder.link(display, value)
+        elif kind == "mention":
+            builder.mention(display, value)
         else:
-            builder.text(part)
-            
+            builder.text(display)
     return builder
 
-def get_image_aspect_ratio(media_path: str) -> AspectRatio | None:
-    """Get image dimensions for Bluesky aspect_ratio. Returns None if Pillow unavailable or on failure."""
+def build_thread(tokens: list) -> list[client_utils.TextBuilder]:
+    # One builder per post: text over the grapheme/byte limits is split into a reply
+    # chain, and every record is validated before anything is uploaded or sent. A token
+    # that cannot fit any post raises PostValidationError.
+    posts = richtext.split_tokens(route_mentions(tokens)) or [[]]
+    builders = [build_post_text(post) for post in posts]
+    for builder in builders:
+        richtext.validate_record(builder.build_text(), builder.build_facets())
+    return builders
+
+async def send_reply_chain(bluesky_client, parent_post, builders, root_post=None, kind: str = "reply",
+                           on_post=None) -> list:
+    # Posts each builder as a reply to the one before it, starting under parent_post.
+    # on_post(reply) runs after each one, so progress survives a failure part-way.
+    root_ref = models.create_strong_ref(root_post or parent_post)
+    replies = []
+    for builder in builders:
+        with metrics.stage("send_post"), tracing.span("reply", kind=kind):
+            reply = await bluesky_client.send_post(
+                text=builder,
+                reply_to=models.AppBskyFeedPost.ReplyRef(parent=models.create_strong_ref(parent_post), root=root_ref)
+            )
+        replies.append(reply)
+        if on_post:
+            on_post(reply)
+        parent_post = reply
+    return replies
+
+def get_image_aspect_ratio(media_source: str | bytes, dimensions: tuple | None = None) -> AspectRatio | None:
+    """Get image dimensions for Bluesky aspect_ratio from a path or in-memory buffer. Returns None if Pillow unavailable or on failure."""
+    # Dimensions already known from media.prepare_image skip opening the image again
+    if dimensions and dimensions[0] and dimensions[1]:
+        return AspectRatio(width=dimensions[0], height=dimensions[1])
+    # Header-only probe first; Pillow is the fallback for formats it does not cover
+    size = media.probe_image_size(media_source)
+    if size and size[0] >= 1 and size[1] >= 1:
+        return AspectRatio(width=size[0], height=size[1])
     if not _PIL_AVAILABLE:
         return None
     try:
-        with PILImage.open(media_path) as img:
+        if isinstance(media_source, (bytes, bytearray)):
+            media_source = io.BytesIO(media_source)
+        with PILImage.open(media_source) as img:
             w, h = img.size
             if w >= 1 and h >= 1:
                 return AspectRatio(width=w, height=h)
@@ -398,24 +625,65 @@ def get_image_aspect_ratio(media_path: str) -> AspectRatio | None:
     return None
 
 
-async def upload_media(bluesky_client, media_path, media_type):
+def get_video_aspect_ratio(media_source: str | bytes) -> AspectRatio | None:
+    # Width/height from the MP4 moov/tkhd boxes; the video itself is never decoded
+    size = media.probe_mp4_size(media_source)
+    if size and size[0] >= 1 and size[1] >= 1:
+        return AspectRatio(width=size[0], height=size[1])
+    return None
+
+
+def _read_file(media_path: str) -> bytes:
+    with open(media_path, 'rb') as f:
+        return f.read()
+
+
+async def upload_media(bluesky_client, media_source, media_type, stream: bool = True, prepare_images: bool = True):
+    # media_source is a file path, or bytes when the in-memory media pipeline is enabled
     try:
-        with open(media_path, 'rb') as f:
-            media_data = f.read()
-        
-        # Upload the media to Bluesky
-        upload_response = bluesky_client.com.atproto.repo.upload_blob(media_data)
+        upload_response = None
+        dimensions = None
+        if media_type == "image" and prepare_images:
+            # Downscale/re-encode oversized images in a worker process before uploading,
+            # so the blob size limit never costs a failed upload
+            if not isinstance(media_source, (bytes, bytearray)):
+                media_source = await asyncio.to_thread(_read_file, media_source)
+            media_source, width, height = await media.prepare_image(bytes(media_source))
+            dimensions = (width, height)
+        in_memory = isinstance(media_source, (bytes, bytearray))
+        media_path = None if in_memory else media_source
+        # Stream large files from disk in chunks so a big video never sits in memory whole
+        if stream and not in_memory and os.path.getsize(media_path) >= media.STREAM_MIN_SIZE:
+            try:
+                upload_response = await media.upload_blob_streaming(
+                    bluesky_client, media_path, media.guess_mime_type(media_path, media_type)
+                )
+            except media.BlobUploadError as e:
+                if not e.token_expired:
+                    raise
+                warning("Session expired during streaming upload, retrying through the client...")
+
+        if upload_response is None and in_memory:
+            upload_response = await bluesky_client.com.atproto.repo.upload_blob(bytes(media_source))
+        elif upload_response is None:
+            # Read off the event loop so a large video does not stall other targets
+            media_data = await asyncio.to_thread(_read_file, media_path)
+
+            # Upload the media to Bluesky
+            upload_response = await bluesky_client.com.atproto.repo.upload_blob(media_data)
         
         if upload_response and hasattr(upload_response, "blob"):
             success(f"Successfully uploaded {media_type} to Bluesky.")
             
             if media_type == "video":
+                aspect_ratio = await asyncio.to_thread(get_video_aspect_ratio, media_source)
                 return VideoEmbed(
                     video=upload_response.blob,
-                    alt="Video uploaded from tweet"
+                    alt="Video uploaded from tweet",
+                    aspect_ratio=aspect_ratio
                 )
             elif media_type == "image":
-                aspect_ratio = get_image_aspect_ratio(media_path)
+                aspect_ratio = get_image_aspect_ratio(media_source, dimensions)
                 return Image(
                     alt="Image uploaded from tweet",
                     image=upload_response.blob,
@@ -425,10 +693,30 @@ async def upload_media(bluesky_client, media_path, media_type):
         error(f"Failed to upload {media_type}: {e}")
     return None
 
-async def get_tweets_with_retry(app, user, max_retries=3):
+def is_rate_limit_error(e: Exception) -> bool:
+    # tweety raises RateLimitReached; other layers surface a plain HTTP 429
+    message = str(e).lower()
+    return type(e).__name__ == "RateLimitReached" or re.search(r"\b429\b", message) is not None or "rate limit" in message
+
+
+def rate_limit_retry_after(e: Exception, default: float = 60) -> float:
+    for attr in ("retry_after", "wait_time"):
+        value = getattr(e, attr, None)
+        if isinstance(value, (int, float)) and value > 0:
+            return float(value)
+    return default
+
+
+async def get_tweets_with_retry(app, user, max_retries=3, replies: bool = False, slots=None):
     for attempt in range(max_retries):
         try:
-            return await app.get_tweets(user)
+            # The governor delays the call if the Twitter budget is spent. The token is
+            # taken before a request slot, so waiting out a rate limit never holds a slot
+            # that other targets and the outbox workers need.
+            await ratelimit.acquire("twitter")
+            async with slots or contextlib.nullcontext():
+                with metrics.stage("get_tweets"):
+                    return await app.get_tweets(user, replies=replies)
         except (http.client.RemoteDisconnected, http.client.HTTPException) as e:
             if attempt == max_retries - 1:
                 raise
@@ -436,133 +724,878 @@ async def get_tweets_with_retry(app, user, max_retries=3):
             warning(f"Connection error (attempt {attempt + 1}/{max_retries}). Retrying in {wait_time} seconds...")
             await asyncio.sleep(wait_time)
         except Exception as e:
+            if is_rate_limit_error(e) and attempt < max_retries - 1:
+                # Block the bucket until the limit resets; the next acquire() waits for it
+                retry_after = rate_limit_retry_after(e)
+                ratelimit.get_bucket("twitter").block_for(retry_after)
+                warning(f"Twitter rate limit reached (attempt {attempt + 1}/{max_retries}). Retrying in {retry_after:.0f} seconds...")
+                continue
             error(f"Unexpected error: {e}")
             raise
     return None
 
-async def download_tweet_media(tweet):
+async def _download_media_item(item, index: int, prefix, spill_dir: str | None = None,
+                               spill_threshold: int | None = None) -> tuple[str, str | bytes | None]:
+    # Download one media item. Returns ("video" | "image", path, bytes or None).
+    # With spill_dir set, media is fetched into memory; videos over spill_threshold go to spill_dir.
+    media_type = item.type if hasattr(item, 'type') else 'photo'
+    process(f"Downloading {media_type} media...")
+
+    if media_type == "video":
+        best_stream = await item.best_stream()
+        if not best_stream:
+            warning("No stream available for video")
+            return "video", None
+        url = getattr(best_stream, "url", None)
+        if spill_dir and url:
+            return "video", await media.download_to_buffer(url, spill_dir, spill_threshold, f"video{index}.mp4")
+        return "video", await best_stream.download(filename=f"{prefix}_video{index}.mp4")
+
+    url = getattr(item, "media_url_https", None)
+    if spill_dir and url:
+        return "image", await media.download_to_buffer(url)
+    return "image", await item.download(filename=f"{prefix}_image{index}.jpg")
+
+
+async def download_tweet_media(tweet, max_concurrent: int = 4, timeout: float = 120,
+                               spill_dir: str | None = None, spill_threshold: int | None = None,
+                               items: list | None = None):
+    # Downloads every media item (or just items, a subset of them) concurrently, at most
+    # max_concurrent at once and each capped at timeout seconds. images/videos keep the
+    # order the media appear in the tweet.
+    # Entries are file paths, or bytes when spill_dir enables the in-memory pipeline.
     images = []
     videos = []
-    if hasattr(tweet, 'media') and tweet.media:
-        for index, media in enumerate(tweet.media):
-            try:
-                media_type = media.type if hasattr(media, 'type') else 'photo'
-                process(f"Downloading {media_type} media...")
-
-                if media_type == "video":
-                    best_stream = await media.best_stream()
-                    if best_stream:
-                        video_path = await best_stream.download(filename=f"video{index}.mp4")
-                        if video_path:
-                            videos.append(video_path)
-                            success(f"Downloaded video as {video_path}")
-                    else:
-                        warning("No stream available for video")
+    # Prefix files with the tweet ID so concurrent targets never overwrite each other's media
+    prefix = getattr(tweet, "id", "tweet")
+    items = getattr(tweet, "media", None) if items is None else items
+    if not items:
+        return images, videos
+
+    slots = asyncio.Semaphore(max(1, max_concurrent))
+
+    async def download(index: int, item):
+        async with slots:
+            start = time.perf_counter()
+            with tracing.span("download", index=index) as span:
+                try:
+                    media_type, source = await asyncio.wait_for(
+                        _download_media_item(item, index, prefix, spill_dir, spill_threshold), timeout
+                    )
+                except asyncio.TimeoutError:
+                    error(f"Timed out downloading media {index} after {timeout} seconds.")
+                    for leftover in (f"{prefix}_video{index}.mp4", f"{prefix}_image{index}.jpg"):
+                        if os.path.exists(leftover):
+                            os.remove(leftover)
+                    span["outcome"] = "timeout"
+                    return None, None
+                except Exception as e:
+                    error(f"Failed to download media: {e}")
+                    span.update(outcome="failed", error=str(e))
+                    return None, None
+                span["media_type"] = media_type
+                if source:
+                    if tracing.enabled():
+                        span["bytes"] = media.media_size(source)
+                    success(f"Downloaded {media_type} as {media.describe_media(source)} in {time.perf_counter() - start:.2f}s")
                 else:
-                    image_path = await media.download(filename=f"image{index}.jpg")
-                    if image_path:
-                        images.append(image_path)
-                        success(f"Downloaded image as {image_path}")
-            except Exception as e:
-                error(f"Failed to download media: {e}")
-                continue
+                    span["outcome"] = "failed"
+            return media_type, source
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(download(i, m) for i, m in enumerate(items)))
+    for media_type, source in results:
+        if not source:
+            continue
+        if media_type == "video":
+            videos.append(source)
+        else:
+            images.append(source)
+    info(f"Downloaded {len(images) + len(videos)}/{len(results)} media item(s) in {time.perf_counter() - start:.2f}s")
     return images, videos
 
-async def post_to_bluesky(bluesky_client, post_text: str, images, videos, enable_translation: bool, from_lang: str, to_lang: str):
-    try:
-        builder = build_post_text(post_text)
+async def post_to_bluesky(bluesky_client, post_text: str, images, videos, enable_translation: bool, from_lang: str, to_lang: str, *, max_concurrent_uploads: int = 4, stream_uploads: bool = True, prepare_images: bool = True, thread: list | None = None, reply_to=None, resume: dict | None = None, checkpoint=None, top_posts: int | None = None, config: dict | None = None):
+    # Returns (first post, last post of its thread), so callers can index their URI/CID.
+    # reply_to (a ReplyRef) posts everything as a reply in an existing thread.
+    # Posts are made in a fixed order: the top-level posts (one for the images, one per
+    # video, or a single text post), then the continuation chain. checkpoint(first, tail,
+    # posts_done) runs after each one. resume is the last checkpoint of a failed attempt:
+    # images/videos then hold only the media still to post, top_posts is the tweet's full
+    # top-level count, and nothing that already exists is posted again. config (from
+    # load_config) supplies the translation backend settings and cache TTL.
+    posts_done = resume["posts_done"] if resume else 0
+    first_response = resume["first"] if resume else None
+    tail_response = resume["tail"] if resume else None
+    top_posts = top_posts or ((1 if images else 0) + len(videos) or 1)
+    # Validate before any upload: a record the PDS would reject raises PostValidationError
+    # here, without a single network call. Media goes on the first post of the thread.
+    thread = thread or build_thread(richtext.tokenize(post_text))
+    builder, continuation = thread[0], thread[1:]
+    if continuation:
+        info(f"Post text is over the limit, splitting into a thread of {len(thread)} posts")
+    # Translate at most once per tweet, however many posts it turns into. The request
+    # starts now so it runs alongside the media uploads instead of after the post.
+    translation_task = None
+    if enable_translation:
+        translation_task = asyncio.create_task(
+            translate_text(post_text, enable_translation, from_lang, to_lang, config)
+        )
+
+    async def translate_once():
+        return await translation_task if translation_task else None
 
+    def created(response, tail=None):
+        nonlocal posts_done, first_response, tail_response
+        posts_done += 1
+        first_response = first_response or response
+        # Continuations hang under the first post; the tail is the last of them
+        tail_response = tail or first_response
+        if checkpoint:
+            checkpoint(first_response, tail_response, posts_done)
+
+    # Top-level posts made by this attempt
+    posted = []
+    try:
         if images or videos:
             process("Posting to BlueSky with media...")
 
-            image_objects = []
-            for image_path in images:
-                embed = await upload_media(bluesky_client, image_path, "image")
-                if embed:
-                    image_objects.append(embed)
-
-            video_embeds = []
-            for video_path in videos:
-                embed = await upload_media(bluesky_client, video_path, "video")
-                if embed:
-                    video_embeds.append(embed)
+            # Upload every blob concurrently; gather keeps the original order and
+            # upload_media returns None on failure, so one bad upload never cancels the rest
+            slots = asyncio.Semaphore(max(1, max_concurrent_uploads))
+
+            async def upload(media_path, media_type):
+                async with slots:
+                    with metrics.stage("upload_media"), tracing.span("upload", media_type=media_type) as span:
+                        if tracing.enabled():
+                            span["bytes"] = media.media_size(media_path)
+                        result = await upload_media(bluesky_client, media_path, media_type, stream_uploads, prepare_images)
+                        if result is None:
+                            span["outcome"] = "failed"
+                    if result is None:
+                        metrics.inc(f"{metrics.PREFIX}_upload_failures_total", media_type=media_type)
+                    return result
+
+            start = time.perf_counter()
+            embeds = await asyncio.gather(
+                *(upload(path, "image") for path in images),
+                *(upload(path, "video") for path in videos),
+            )
+            image_objects = [e for e in embeds[:len(images)] if e]
+            video_embeds = embeds[len(images):]
+            info(f"Uploaded {sum(1 for e in embeds if e)}/{len(embeds)} media item(s) in {time.perf_counter() - start:.2f}s")
+            # Every top-level post must be made, or a retry could not tell which ones
+            # exist; posting the text alone would lose the media for good
+            if images and not image_objects:
+                raise RuntimeError(f"None of the {len(images)} image(s) could be uploaded")
+            if None in video_embeds:
+                raise RuntimeError(f"{video_embeds.count(None)} of {len(video_embeds)} video(s) could not be uploaded")
 
             if image_objects:
                 image_embed = ImageEmbed(images=image_objects)
-                response = bluesky_client.send_post(
-                    text=builder,
-                    embed=image_embed
-                )
+                with metrics.stage("send_post"), tracing.span("post", kind="images", media=len(image_objects)):
+                    response = await bluesky_client.send_post(
+                        text=builder,
+                        embed=image_embed,
+                        reply_to=reply_to
+                    )
                 success(f"Posted images to BlueSky. Response: {response}")
-                translated = translate_text(post_text, enable_translation, from_lang, to_lang)
-                if translated:
-                    send_translation_reply(bluesky_client, response, translated)
+                posted.append(response)
+                created(response)
 
-            if video_embeds:
-                for video_embed in video_embeds:
-                    response = bluesky_client.send_post(
+            for video_embed in video_embeds:
+                with metrics.stage("send_post"), tracing.span("post", kind="video"):
+                    response = await bluesky_client.send_post(
                         text=builder,
-                        embed=video_embed
+                        embed=video_embed,
+                        reply_to=reply_to
                     )
-                    success(f"Posted video to BlueSky. Response: {response}")
-                    translated = translate_text(post_text, enable_translation, from_lang, to_lang)
-                    if translated:
-                        send_translation_reply(bluesky_client, response, translated)
-        else:
+                success(f"Posted video to BlueSky. Response: {response}")
+                posted.append(response)
+                created(response)
+        elif posts_done < top_posts:
             process("Posting to BlueSky without media...")
-            response = bluesky_client.send_post(text=builder)
+            with metrics.stage("send_post"), tracing.span("post", kind="text"):
+                response = await bluesky_client.send_post(text=builder, reply_to=reply_to)
             success(f"Posted text to BlueSky. Response: {response}")
-            translated = translate_text(post_text, enable_translation, from_lang, to_lang)
+            posted.append(response)
+            created(response)
+
+        if first_response is not None:
+            chain_done = max(0, posts_done - top_posts)
+            if continuation[chain_done:]:
+                root = reply_to.root if reply_to else first_response
+                parent = tail_response if chain_done else first_response
+                replies = await send_reply_chain(
+                    bluesky_client, parent, continuation[chain_done:], root, "continuation",
+                    on_post=lambda reply: created(reply, reply),
+                )
+                success(f"Posted {len(replies)} thread continuation(s) under {first_response.uri}")
+            translated = await translate_once()
             if translated:
-                send_translation_reply(bluesky_client, response, translated)
+                # Posts from an earlier attempt get theirs under the first post only
+                for response in ([first_response] if resume else []) + posted:
+                    await send_translation_reply(bluesky_client, response, translated, reply_to.root if reply_to else None)
     except Exception as e:
         error(f"Failed to post to BlueSky: {e}")
         raise
+    finally:
+        if translation_task and not translation_task.done():
+            translation_task.cancel()
+    return first_response, tail_response
+
+def replied_to_id(tweet) -> int | None:
+    # tweety exposes the parent as replied_to (a Tweet, or just its ID); fall back to
+    # the raw API field
+    parent = getattr(tweet, "replied_to", None)
+    parent = getattr(parent, "id", parent)
+    if parent is None:
+        raw = getattr(tweet, "_original_tweet", None)
+        parent = raw.get("in_reply_to_status_id_str") if isinstance(raw, dict) else None
+    try:
+        return int(parent)
+    except (TypeError, ValueError):
+        return None
+
+def thread_reply_ref(tweet):
+    # ReplyRef under the mirrored parent of a self-reply, or None for a top-level post.
+    # The parent is found by tweet ID in the index, never by searching the author feed.
+    parent_id = replied_to_id(tweet)
+    ref = store.get_thread_ref(parent_id) if parent_id is not None else None
+    if ref is None:
+        return None
+    return models.AppBskyFeedPost.ReplyRef(root=strong_ref(ref["root"]), parent=strong_ref(ref["parent"]))
+
+def strong_ref(ref: tuple):
+    # (uri, cid) from the index -> a strong ref to reply under
+    return models.ComAtprotoRepoStrongRef.Main(uri=ref[0], cid=ref[1])
+
+def media_posts(items) -> list[list]:
+    # The top-level posts a tweet's media becomes, in posting order: one post for all the
+    # images, then one per video. Built from the tweet itself, so every attempt agrees.
+    images = [item for item in items if getattr(item, "type", "photo") != "video"]
+    videos = [[item] for item in items if getattr(item, "type", "photo") == "video"]
+    return ([images] if images else []) + videos
+
+async def process_tweet(tweet, bluesky_client, config: dict, resume: dict | None = None, checkpoint=None):
+    # Returns (first post, last post, ReplyRef used or None).
+    # resume/checkpoint carry progress across attempts; see post_to_bluesky.
+    enable_translation = config.get("enable_translation", False)
+    from_lang = config.get("translation_from", "es")
+    to_lang = config.get("translation_to", "en")
 
-async def process_tweet(tweet, bluesky_client, enable_translation: bool, from_lang: str, to_lang: str):
     tweet_text = tweet.text if hasattr(tweet, 'text') else "No text available"
     info(f"Original Tweet Message: {tweet_text}")
 
-    cleaned_text = clean_tweet_text(tweet_text)
+    # Expand t.co links (media links are dropped), replace 'RT ' at the beginning with
+    # '🔁' and collapse double spaces (not touching newlines)
+    tokens = richtext.tokenize(tweet_text, tweet_url_map(tweet))
+    cleaned_text = richtext.plain_text(tokens)
     info(f"Cleaned Tweet Message: {cleaned_text}")
 
-    images, videos = await download_tweet_media(tweet)
+    # Checked before downloading anything, so a record bound to fail costs no bandwidth
+    thread = build_thread(tokens)
+
+    reply_to = thread_reply_ref(tweet)
+    if reply_to:
+        info(f"Tweet replies to tweet {replied_to_id(tweet)}; posting as a reply to {reply_to.parent.uri}")
+
+    # Media of top-level posts an earlier attempt already made is not downloaded again
+    groups = media_posts(getattr(tweet, "media", None) or [])
+    posts_done = resume["posts_done"] if resume else 0
+    pending = [item for group in groups[posts_done:] for item in group]
+    if resume:
+        info(f"Resuming tweet {tweet.id}: {posts_done} post(s) already on Bluesky, first at {resume['first'].uri}")
+
+    # In-memory mode keeps media in buffers; only large videos spill to a private temp dir
+    spill_dir = tempfile.mkdtemp(prefix="t2b-media-") if config.get("in_memory_media", False) else None
+    with metrics.stage("download_media"):
+        images, videos = await download_tweet_media(
+            tweet,
+            config.get("max_concurrent_downloads", 4),
+            config.get("media_download_timeout", 120),
+            spill_dir,
+            config.get("in_memory_video_max_bytes"),
+            pending,
+        )
 
     try:
-        await post_to_bluesky(bluesky_client, cleaned_text, images, videos, enable_translation, from_lang, to_lang)
+        expected_videos = sum(1 for item in pending if getattr(item, "type", "photo") == "video")
+        if (len(pending) > expected_videos and not images) or len(videos) < expected_videos:
+            # Like a failed upload: retry rather than post the tweet without its media
+            raise RuntimeError("Media could not be downloaded")
+        first_response, tail_response = await post_to_bluesky(
+            bluesky_client,
+            cleaned_text,
+            images,
+            videos,
+            enable_translation,
+            from_lang,
+            to_lang,
+            max_concurrent_uploads=config.get("max_concurrent_uploads", 4),
+            stream_uploads=config.get("stream_uploads", True),
+            prepare_images=config.get("prepare_images", True),
+            thread=thread,
+            reply_to=reply_to,
+            resume=resume,
+            checkpoint=checkpoint,
+            top_posts=len(groups) or 1,
+            config=config,
+        )
+        return first_response, tail_response, reply_to
     finally:
-        for image_path in images:
+        for media_path in images + videos:
+            if not isinstance(media_path, str):
+                continue
+            try:
+                os.remove(media_path)
+                info(f"Deleted {media_path}")
+            except Exception as e:
+                error(f"Failed to delete {media_path}: {e}")
+        if spill_dir:
+            shutil.rmtree(spill_dir, ignore_errors=True)
+
+def _tweet_id_int(tweet) -> int | None:
+    try:
+        return int(tweet.id)
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def flatten_timeline(items) -> list:
+    # tweety groups a self-thread into one timeline entry with a tweets list
+    flat = []
+    for item in items:
+        inner = getattr(item, "tweets", None)
+        if isinstance(inner, list) and not hasattr(item, "text"):
+            flat.extend(inner)
+        else:
+            flat.append(item)
+    return flat
+
+
+def drop_foreign_replies(tweets, target_username: str) -> list:
+    # Keeps top-level tweets and self-replies (the parent is the target's own tweet: in
+    # this batch or already in the index); replies to other accounts are not mirrored.
+    # A conversation entry also carries the other account's tweet the target replied to,
+    # which looks top-level, so anything the target did not write goes first.
+    tweets = [
+        t for t in tweets
+        if (getattr(getattr(t, "author", None), "username", None) or "").lower() == target_username.lower()
+    ]
+    ids = {_tweet_id_int(t) for t in tweets}
+    kept = []
+    for tweet in tweets:
+        parent_id = replied_to_id(tweet)
+        if parent_id is not None and parent_id not in ids:
+            parent_author = getattr(getattr(getattr(tweet, "replied_to", None), "author", None), "username", None)
+            if parent_author:
+                if parent_author.lower() != target_username.lower():
+                    continue
+            else:
+                parent = store.get_tweet(parent_id)
+                if parent is None or parent["target"] != target_username.lower():
+                    continue
+        kept.append(tweet)
+    return kept
+
+
+def select_new_tweets(all_tweets, last_tweet_id: int | None, catch_up: bool, limit: int) -> tuple[list, int | None]:
+    # Returns (tweets to post oldest-first, highest tweet ID seen).
+    # IDs are compared numerically and already-mirrored tweets are skipped via the index;
+    # on first run (no last_tweet_id) only the latest tweet is posted.
+    tweets = sorted(
+        (t for t in all_tweets if _tweet_id_int(t) is not None),
+        key=_tweet_id_int,
+    )
+    if not tweets:
+        return [], None
+    latest_id = _tweet_id_int(tweets[-1])
+
+    if last_tweet_id is None:
+        return [tweets[-1]], latest_id
+
+    newer = [
+        t for t in tweets
+        if _tweet_id_int(t) > last_tweet_id and not store.is_posted(_tweet_id_int(t))
+    ]
+    if not catch_up:
+        # Only the latest tweet, plus any new tweets it continues as a self-thread, so a
+        # thread posted between checks still arrives with its context
+        by_id = {_tweet_id_int(t): t for t in newer}
+        chain = newer[-1:]
+        while chain and replied_to_id(chain[0]) in by_id:
+            chain.insert(0, by_id[replied_to_id(chain[0])])
+        return chain, latest_id
+    if len(newer) > limit:
+        info(f"{len(newer)} new tweets found, posting the oldest {limit} this cycle.")
+        newer = newer[:limit]
+    return newer, latest_id
+
+
+async def reinit_clients(shared: dict, generation: int) -> None:
+    # Re-create the shared Twitter and Bluesky clients once, even if several targets fail together
+    async with shared["reinit_lock"]:
+        if shared["generation"] != generation:
+            return
+        try:
+            shared["twitter"] = await init_twitter_app(shared["config"])
+            shared["bluesky"] = await init_bluesky_client()
+            shared["generation"] += 1
+            success("Clients re-initialized successfully.")
+        except Exception as init_e:
+            error(f"Failed to re-initialize clients: {init_e}")
+
+
+# X API error codes for a handle that no longer points at an account: 50 "User not
+# found.", 63 "User has been suspended."
+USER_GONE_ERROR_CODES = (50, 63)
+
+
+def is_user_gone_error(e: Exception) -> bool:
+    # tweety raises UserNotFound / UserProtected when a handle no longer points at the
+    # account we resolved. Only user errors count: a missing tweet or media URL is also a
+    # "not found" and must not drop the cached user.
+    if type(e).__name__ in ("UserNotFound", "UserProtected", "SuspendedAccount", "AccountSuspended"):
+        return True
+    if getattr(e, "error_code", None) in USER_GONE_ERROR_CODES:
+        return True
+    message = str(e).lower()
+    return "user not found" in message or "user has been suspended" in message
+
+
+def invalidate_user(shared: dict, username: str) -> None:
+    shared["users"].pop(username.lower(), None)
+    store.delete_cached_user(username)
+
+
+async def resolve_user(shared: dict, username: str, slots):
+    # Resolve a handle once and reuse it across polls. The in-memory layer keeps the tweety
+    # User object; after a restart the persisted user ID is passed to get_tweets instead.
+    key = username.lower()
+    ttl = shared["config"].get("user_cache_ttl", 86400)
+    now = time.time()
+
+    cached = shared["users"].get(key)
+    if cached and now - cached[1] < ttl:
+        return cached[0]
+
+    row = store.get_cached_user(username, ttl)
+    if row:
+        shared["users"][key] = (row["user_id"], row["fetched_at"])
+        return row["user_id"]
+
+    await ratelimit.acquire("twitter")
+    async with slots:
+        user = await shared["twitter"].get_user_info(username)
+    if user:
+        shared["users"][key] = (user, now)
+        store.put_cached_user(username, str(user.id), getattr(user, "name", None), now)
+        info(f"Resolved '{username}' to user ID {user.id}.")
+    return user
+
+
+def choose_interval(target: dict, config: dict, tweets, found_new: bool) -> int:
+    # Fixed check_interval unless ADAPTIVE_POLLING is on, in which case the scheduler
+    # picks it from the target's recent cadence. The choice is kept on the target dict.
+    if not config.get("adaptive_polling", False):
+        target["current_interval"] = target["check_interval"]
+        return target["check_interval"]
+    target["idle_polls"] = 0 if found_new else target.get("idle_polls", 0) + 1
+    interval = scheduler.next_interval(
+        target["check_interval"],
+        scheduler.tweet_timestamps(tweets or []),
+        target["idle_polls"],
+        config.get("adaptive_min_interval", 60),
+        config.get("adaptive_max_interval", 3600),
+    )
+    target["current_interval"] = max(1, round(interval))
+    return target["current_interval"]
+
+
+def get_target_intervals(shared: dict) -> dict[str, int]:
+    # Current polling interval per target, as chosen by choose_interval
+    return {
+        target["username"]: target.get("current_interval", target["check_interval"])
+        for _, target in shared.get("tasks", {}).values()
+    }
+
+
+async def monitor_target(shared: dict, target: dict):
+    # Poll a single target forever. The target dict is updated in place on config reload.
+    target_username = target["username"]
+    last_tweet_id = store.get_last_tweet_id(target_username)
+    while not shutdown_flag:
+        config = shared["config"]
+        # Read each cycle: a config reload may replace the semaphore with a resized one
+        slots = shared["request_slots"]
+        check_interval = target["check_interval"]
+        generation = shared["generation"]
+
+        process(f"Checking for new tweets from '{target_username}'...")
+
+        try:
+            user = await resolve_user(shared, target_username, slots)
+            if not user:
+                error(f"Could not retrieve user info for '{target_username}'.")
+                await interruptible_sleep(300)
+                continue
+
             try:
-                os.remove(image_path)
-                info(f"Deleted {image_path}")
+                polled_at, poll_started = time.time(), time.perf_counter()
+                all_tweets = await get_tweets_with_retry(
+                    shared["twitter"], user, replies=config.get("mirror_self_replies", True), slots=slots
+                )
+                poll_time = time.perf_counter() - poll_started
             except Exception as e:
-                error(f"Failed to delete {image_path}: {e}")
-        for video_path in videos:
+                if is_user_gone_error(e):
+                    warning(f"'{target_username}' may have been renamed or suspended. Dropping cached user.")
+                    invalidate_user(shared, target_username)
+                raise
+            if all_tweets is None:
+                error(f"Could not retrieve tweets for '{target_username}'.")
+                await interruptible_sleep(300)
+                continue
+
+            if all_tweets:
+                all_tweets = drop_foreign_replies(flatten_timeline(all_tweets), target_username)
+            if all_tweets:
+                new_tweets, latest_id = select_new_tweets(
+                    all_tweets,
+                    last_tweet_id,
+                    config.get("catch_up", True),
+                    config.get("max_posts_per_cycle", 5),
+                )
+
+                if latest_id is None:
+                    warning(f"No valid tweets found for '{target_username}'. Waiting for next check...")
+                    await interruptible_sleep(check_interval)
+                    continue
+
+                info(f"Latest Tweet ID for '{target_username}': {latest_id}")
+                found_new = bool(new_tweets)
+                if not new_tweets:
+                    info(f"Skipping already-posted tweet {latest_id}.")
+
+                # Oldest first. Enqueueing is durable and advances the watermark; the outbox
+                # workers do the posting, so a slow upload never delays the next poll.
+                # The poll's timing goes with each tweet, to be traced as its fetch stage.
+                fetched = {"started": polled_at, "duration": poll_time, "source": "poll", "tweets": len(new_tweets)}
+                for tweet in new_tweets:
+                    tweet_id = tweet.id
+                    success(f"New Tweet ID: {tweet_id}. Queued for posting.")
+                    shared["pending_tweets"][int(tweet_id)] = (tweet, fetched)
+                    store.enqueue_outbox(tweet_id, target_username)
+                    last_tweet_id = int(tweet_id)
+                if new_tweets:
+                    shared["outbox_event"].set()
+            else:
+                found_new = False
+                warning(f"No tweets found for the user '{target_username}'.")
+
+            check_interval = choose_interval(target, config, all_tweets, found_new)
+            info(f"Waiting for {check_interval} seconds before checking '{target_username}' again...")
+            await interruptible_sleep(check_interval)
+
+        except asyncio.CancelledError:
+            raise
+        except (http.client.RemoteDisconnected, http.client.HTTPException) as e:
+            error(f"Connection error for '{target_username}': {e}. Waiting {check_interval} seconds...")
+            await interruptible_sleep(check_interval)
+            continue
+        except Exception as e:
+            if is_rate_limit_error(e):
+                ratelimit.get_bucket("twitter").block_for(rate_limit_retry_after(e, check_interval))
+                warning(f"Rate limited while checking '{target_username}'. Waiting {check_interval} seconds...")
+                await interruptible_sleep(check_interval)
+                continue
+            error(f"Unexpected error for '{target_username}': {e}. Re-initializing clients before next check...")
+            await interruptible_sleep(check_interval)
+            await reinit_clients(shared, generation)
+            continue
+
+
+def outbox_backoff(attempts: int) -> float:
+    # 30s, 60s, 120s, ... capped at one hour
+    return min(3600, 30 * 2 ** max(0, attempts - 1))
+
+
+async def fetch_tweet(shared: dict, tweet_id: int):
+    # After a restart the tweety object for a queued tweet is gone; fetch it again by ID
+    await ratelimit.acquire("twitter")
+    async with shared["request_slots"]:
+        return await shared["twitter"].tweet_detail(str(tweet_id))
+
+
+async def outbox_worker(shared: dict, worker_id: int):
+    # Consumer: claims the oldest ready outbox entry (one in flight per target, so each
+    # target posts in order), posts it, then completes, retries or dead-letters it
+    inflight = shared["outbox_inflight"]
+    event = shared["outbox_event"]
+
+    # Workers numbered above OUTBOX_WORKERS (lowered by a reload) stop at the next claim
+    while not shutdown_flag and worker_id <= shared["config"].get("outbox_workers", 2):
+        entry = store.claim_outbox(inflight)
+        if entry is None:
+            next_attempt = store.next_outbox_attempt()
+            timeout = CONFIG_CHECK_INTERVAL
+            if next_attempt is not None:
+                timeout = min(timeout, max(0.1, next_attempt - time.time()))
+            event.clear()
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        tweet_id = entry["tweet_id"]
+        target_username = entry["target"]
+        attempts = entry["attempts"] + 1
+        config = shared["config"]
+        inflight.add(target_username)
+        with tracing.trace(tweet_id, target=target_username, attempt=attempts) as trace:
             try:
-                os.remove(video_path)
-                info(f"Deleted {video_path}")
+                tweet, fetched = shared["pending_tweets"].get(tweet_id, (None, None))
+                if tweet is None:
+                    with tracing.span("fetch", source="tweet_detail"):
+                        tweet = await fetch_tweet(shared, tweet_id)
+                elif fetched:
+                    tracing.add_span("fetch", **fetched)
+                # A retry reuses the tweet without fetching it, so it has no fetch span
+                shared["pending_tweets"][tweet_id] = (tweet, None)
+                process(f"[outbox {worker_id}] Posting tweet {tweet_id} from '{target_username}' (attempt {attempts})...")
+                # A failed attempt may have made some of the tweet's posts; carry on from there
+                progress = store.get_progress(tweet_id)
+                resume = None
+                if progress:
+                    resume = {
+                        "first": strong_ref(progress["first"]),
+                        "tail": strong_ref(progress["tail"]),
+                        "posts_done": progress["posts_done"],
+                    }
+
+                def checkpoint(first, tail, posts_done):
+                    store.save_progress(tweet_id, target_username, (first.uri, first.cid), (tail.uri, tail.cid), posts_done)
+
+                # No request slot is held while posting: OUTBOX_WORKERS bounds how many posts
+                # are in flight, so a long video upload never delays the pollers
+                response, tail, reply_to = await process_tweet(tweet, shared["bluesky"], config, resume, checkpoint)
+                if getattr(response, "uri", None) is None:
+                    # Completing without a post would drop the tweet from the outbox unposted
+                    raise RuntimeError("No Bluesky post was created")
+                # The index lets later self-replies find this post's thread in one lookup
+                store.complete_outbox(
+                    tweet_id,
+                    target_username,
+                    getattr(response, "uri", None),
+                    getattr(response, "cid", None),
+                    (reply_to.root.uri, reply_to.root.cid) if reply_to else None,
+                    (tail.uri, tail.cid) if tail is not None and tail.uri != response.uri else None,
+                )
+                shared["pending_tweets"].pop(tweet_id, None)
+                metrics.inc(f"{metrics.PREFIX}_posts_total", target=target_username)
+                trace["outcome"] = "posted"
+                if metrics.enabled() or tracing.enabled():
+                    for created in scheduler.tweet_timestamps([tweet]):
+                        lag = max(0.0, (datetime.now(timezone.utc) - created).total_seconds())
+                        metrics.observe(f"{metrics.PREFIX}_post_lag_seconds", lag)
+                        trace["lag"] = round(lag, 3)
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
-                error(f"Failed to delete {video_path}: {e}")
-
-async def monitor_tweets(
-    app,
-    bluesky_client,
-    target_username: str,
-    check_interval: int,
-    enable_translation: bool,
-    from_lang: str,
-    to_lang: str,
-    auto_update: bool,
-    update_interval: int,
-):
-    state = load_state()
-    last_tweet_id = state.get("last_tweet_id")
+                trace["error"] = str(e)
+                max_attempts = config.get("max_post_attempts", 5)
+                if isinstance(e, richtext.PostValidationError):
+                    # Retrying cannot fix an invalid record
+                    error(f"Tweet {tweet_id} cannot be posted: {e}. Moved to dead-letter list.")
+                    store.dead_letter_outbox(tweet_id, target_username, str(e))
+                    shared["pending_tweets"].pop(tweet_id, None)
+                    metrics.inc(f"{metrics.PREFIX}_post_failures_total", reason="invalid")
+                    trace["outcome"] = "invalid"
+                elif attempts >= max_attempts:
+                    error(f"Giving up on tweet {tweet_id} after {attempts} attempt(s): {e}. Moved to dead-letter list.")
+                    store.dead_letter_outbox(tweet_id, target_username, str(e))
+                    shared["pending_tweets"].pop(tweet_id, None)
+                    metrics.inc(f"{metrics.PREFIX}_post_failures_total", reason="attempts")
+                    trace["outcome"] = "dead"
+                else:
+                    delay = outbox_backoff(attempts)
+                    if is_rate_limit_error(e):
+                        delay = max(delay, rate_limit_retry_after(e))
+                    warning(f"Posting tweet {tweet_id} failed (attempt {attempts}/{max_attempts}): {e}. Retrying in {delay:.0f} seconds...")
+                    store.retry_outbox(tweet_id, str(e), delay)
+                    metrics.inc(f"{metrics.PREFIX}_post_retries_total", rate_limited=str(is_rate_limit_error(e)).lower())
+                    trace["outcome"] = "retry"
+            finally:
+                inflight.discard(target_username)
+
+
+def sync_target_tasks(shared: dict, tasks: dict) -> None:
+    # Start tasks for new targets, stop tasks for removed ones and apply interval changes
+    wanted = {t["username"].lower(): t for t in shared["config"]["targets"]}
+
+    for key in list(tasks):
+        if key not in wanted:
+            task, target = tasks.pop(key)
+            info(f"Target '{target['username']}' removed. Stopping its monitor.")
+            task.cancel()
+
+    for key, new_target in wanted.items():
+        if key in tasks:
+            task, target = tasks[key]
+            if task.done():
+                tasks.pop(key)
+            else:
+                if target["check_interval"] != new_target["check_interval"]:
+                    info(f"Check interval for '{target['username']}' changed to {new_target['check_interval']} seconds.")
+                    target["check_interval"] = new_target["check_interval"]
+                continue
+        target = dict(new_target)
+        info(f"Monitoring '{target['username']}' every {target['check_interval']} seconds.")
+        tasks[key] = (asyncio.create_task(monitor_target(shared, target)), target)
+
+
+def sync_outbox_workers(shared: dict, workers: dict) -> None:
+    # Run OUTBOX_WORKERS workers. Surplus ones finish the post in hand and exit on their
+    # own (see outbox_worker); the event wakes any that are idle so they notice.
+    count = shared["config"].get("outbox_workers", 2)
+    for worker_id in list(workers):
+        if workers[worker_id].done():
+            workers.pop(worker_id)
+    if len(workers) > count:
+        info(f"Stopping {len(workers) - count} outbox worker(s).")
+        shared["outbox_event"].set()
+    for worker_id in range(1, count + 1):
+        if worker_id not in workers:
+            workers[worker_id] = asyncio.create_task(outbox_worker(shared, worker_id))
+
+
+async def apply_exporters(shared: dict, old: dict, config: dict, changed: list) -> None:
+    # Restart the trace writer and metrics endpoint when their settings change
+    if {"trace_enabled", "trace_max_bytes", "trace_backups"} & set(changed):
+        tracing.shutdown()
+        if config["trace_enabled"]:
+            tracing.configure(TRACE_FILE, config["trace_max_bytes"], config["trace_backups"])
+        else:
+            info("Tweet tracing disabled.")
+    if {"metrics_port", "metrics_host"} & set(changed):
+        await metrics.stop_server()
+        if config["metrics_port"]:
+            # Collectors are registered once; the first start_server also enables metrics
+            if not metrics.enabled():
+                start_metrics(shared)
+            try:
+                await metrics.start_server(config["metrics_host"], config["metrics_port"])
+            except OSError as e:
+                error(f"Could not start the metrics endpoint on {config['metrics_host']}:{config['metrics_port']}: {e}")
+        elif old.get("metrics_port"):
+            info("Metrics endpoint stopped.")
+
+
+def configure_rate_limits(config: dict) -> None:
+    # Budgets are per 15 minutes for Twitter and per 5 minutes for Bluesky; Bluesky's
+    # response headers override the configured value once the first reply arrives
+    ratelimit.configure("twitter", config.get("twitter_rate_limit", 50), 15 * 60)
+    ratelimit.configure("bluesky", config.get("bluesky_rate_limit", 3000), 5 * 60)
+
+
+def format_rate_limit_budget() -> str:
+    parts = []
+    for name, budget in ratelimit.snapshot().items():
+        part = f"{name} {budget['remaining']}/{budget['limit']}"
+        if budget["blocked_for"]:
+            part += f" (blocked {budget['blocked_for']:.0f}s)"
+        parts.append(part)
+    return ", ".join(parts)
+
+
+async def apply_config(shared: dict, tasks: dict, config: dict) -> None:
+    # Apply only what changed to the running loop; clients are never restarted here.
+    # Credential changes take effect the next time the clients are re-initialized.
+    old = shared["config"]
+    if not config["targets"]:
+        warning("TARGET_USER is empty after reload. Keeping current targets.")
+        config["targets"] = old["targets"]
+    changed = sorted(k for k in set(old) | set(config) if old.get(k) != config.get(k))
+    if not changed:
+        info("Configuration file changed, but no settings differ.")
+        return
+    # Only key names are logged; values may be credentials
+    info(f"Applying configuration changes: {', '.join(changed)}")
+
+    if "twitter_rate_limit" in changed or "bluesky_rate_limit" in changed:
+        configure_rate_limits(config)
+    if "max_concurrent_requests" in changed:
+        shared["request_slots"] = asyncio.Semaphore(config["max_concurrent_requests"])
+    if {"translation_backend", "translation_api_url", "translation_dictionary_file",
+            "translator_rapidapi_key"} & set(changed):
+        # Recreated from the new settings on next use
+        await translation.close_backend()
+    await apply_exporters(shared, old, config, changed)
+
+    shared["config"] = config
+    if "targets" in changed:
+        sync_target_tasks(shared, tasks)
+    if "outbox_workers" in changed and "workers" in shared:
+        sync_outbox_workers(shared, shared["workers"])
+
+
+def start_metrics(shared: dict) -> None:
+    # Gauges read at scrape time only; with METRICS_PORT unset none of this runs
+    prefix = metrics.PREFIX
+    metrics.describe(f"{prefix}_stage_duration_seconds", "histogram", "Time spent per pipeline stage")
+    metrics.describe(f"{prefix}_post_lag_seconds", "histogram", "Tweet created_at to Bluesky post")
+
+    def collect():
+        depth = store.outbox_depth()
+        samples = [
+            (f"{prefix}_outbox_queued", {}, depth["queued"]),
+            (f"{prefix}_outbox_dead_letters", {}, depth["dead"]),
+        ]
+        for service, budget in ratelimit.snapshot().items():
+            samples.append((f"{prefix}_ratelimit_remaining", {"service": service}, budget["remaining"]))
+            samples.append((f"{prefix}_ratelimit_blocked_seconds", {"service": service}, budget["blocked_for"]))
+        for username, interval in get_target_intervals(shared).items():
+            samples.append((f"{prefix}_poll_interval_seconds", {"target": username}, interval))
+        return samples
+
+    metrics.add_collector(collect)
+
+async def refresh_mentions(shared: dict) -> None:
+    config = shared["config"]
+    try:
+        await mentions.refresh(
+            shared["bluesky"],
+            config.get("mentions_file"),
+            config.get("mention_cache_ttl", mentions.DEFAULT_TTL),
+            config.get("mention_negative_ttl", mentions.DEFAULT_NEGATIVE_TTL),
+        )
+    except Exception as e:
+        warning(f"Mention mapping refresh failed: {e}")
+
+async def monitor_tweets(shared: dict):
+    # Supervisor: runs one monitor_target task per target and handles updates/config reloads
+    global _reload_requested
+    tasks = {}
+    shared["tasks"] = tasks
+    last_budget_log = time.monotonic()
+    sync_target_tasks(shared, tasks)
+    await refresh_mentions(shared)
+
+    depth = store.outbox_depth()
+    if depth["queued"] or depth["dead"]:
+        info(f"Outbox: {depth['queued']} tweet(s) queued from a previous run, {depth['dead']} in the dead-letter list.")
+    workers = {}
+    shared["workers"] = workers
+    sync_outbox_workers(shared, workers)
 
     while not shutdown_flag:
+        config = shared["config"]
+        auto_update = config.get("auto_update", True)
+        update_interval = config.get("update_interval", 86400)
+
         # Check for updates once per update_interval
         if auto_update:
-            state = load_state()
-            last_update_check_str = state.get("last_update_check")
+            last_update_check_str = get_state().get("last_update_check")
             should_check_update = False
 
             if last_update_check_str:
@@ -578,136 +1611,112 @@ async def monitor_tweets(
             if should_check_update:
                 info("Checking for script updates...")
                 update_last_check_time()
+                flush_state()
                 try:
                     from updater import perform_update
                     if perform_update():
                         success("Update applied. Script restarting...")
-                        return
+                        break
                     info("No update available.")
                 except Exception as e:
                     warning(f"Update check failed: {e}")
 
-        # Reload configuration on each iteration to pick up .env changes
-        load_dotenv(override=True)
-        config = load_config()
-        
-        new_target = config.get("target_username")
-        if new_target and new_target != target_username:
-            info(f"Target username changed from '{target_username}' to '{new_target}'. Resetting last_tweet_id.")
-            target_username = new_target
-            state = load_state()
-            state["last_tweet_id"] = None
-            save_state(state)
-            last_tweet_id = None
-            
-        check_interval = config.get("check_interval", 300)
-        enable_translation = config.get("enable_translation", False)
-        from_lang = config.get("translation_from", "es")
-        to_lang = config.get("translation_to", "en")
-        auto_update = config.get("auto_update", True)
-        update_interval = config.get("update_interval", 86400)
+        # Reload configuration only when .env changed or SIGHUP was received
+        force_reload = _reload_requested
+        _reload_requested = False
+        if reload_env_if_changed(force_reload):
+            info("Reloading configuration from .env...")
+            await apply_config(shared, tasks, load_config())
 
-        process("Checking for new tweets...")
+        # Resolves new or expired mention mappings; a no-op unless something is stale
+        await refresh_mentions(shared)
 
-        try:
-            user = await app.get_user_info(target_username)
-            if not user:
-                error(f"Could not retrieve user info for '{target_username}'.")
-                interruptible_sleep(300)
-                continue
+        if time.monotonic() - last_budget_log >= BUDGET_LOG_INTERVAL:
+            info(f"Remaining request budget: {format_rate_limit_budget()}")
+            last_budget_log = time.monotonic()
 
-            all_tweets = await get_tweets_with_retry(app, user)
-            if all_tweets is None:
-                error(f"Could not retrieve tweets for '{target_username}'.")
-                interruptible_sleep(300)
-                continue
+        await interruptible_sleep(CONFIG_CHECK_INTERVAL)
 
-            if all_tweets:
-                # Pick the tweet with the highest ID (most recent)
-                latest_tweet = None
-                for tweet in all_tweets:
-                    if hasattr(tweet, "id"):
-                        if latest_tweet is None or tweet.id > latest_tweet.id:
-                            latest_tweet = tweet
-
-                if latest_tweet is None:
-                    warning("No valid tweets found. Waiting for next check...")
-                    interruptible_sleep(check_interval)
-                    continue
+    for task, _ in tasks.values():
+        task.cancel()
+    await asyncio.gather(*(task for task, _ in tasks.values()), return_exceptions=True)
 
-                tweet_id = latest_tweet.id
-                info(f"Latest Tweet ID: {tweet_id}")
-
-                # Only post if this is a NEW tweet (not already posted)
-                # tweet_id > last_tweet_id ensures we never repost; last_tweet_id None = first run
-                is_new = last_tweet_id is None or str(tweet_id) > str(last_tweet_id)
-                if not is_new:
-                    info(f"Skipping already-posted tweet {tweet_id}.")
-                else:
-                    success(f"New Tweet ID: {tweet_id}")
-                    # await process_tweet directly, it will raise to the outer try/except if it fails
-                    await process_tweet(latest_tweet, bluesky_client, enable_translation, from_lang, to_lang)
-                    update_last_tweet_id(tweet_id)
-                    last_tweet_id = str(tweet_id)
-            else:
-                warning(f"No tweets found for the user '{target_username}'.")
-
-            info(f"Waiting for {check_interval} seconds before checking again...")
-            interruptible_sleep(check_interval)
-
-        except (http.client.RemoteDisconnected, http.client.HTTPException) as e:
-            error(f"Connection error: {e}. Waiting {check_interval} seconds...")
-            interruptible_sleep(check_interval)
-            continue
-        except Exception as e:
-            error(f"Unexpected error: {e}. Re-initializing clients before next check...")
-            interruptible_sleep(check_interval)
-            try:
-                app = await init_twitter_app(config)
-                bluesky_client = init_bluesky_client()
-                success("Clients re-initialized successfully.")
-            except Exception as init_e:
-                error(f"Failed to re-initialize clients: {init_e}")
-            continue
+    # Let workers finish the post in hand (they stop at the next claim), so nothing is
+    # cut off half-posted; whatever is left stays in the outbox for the next run
+    shared["outbox_event"].set()
+    if workers:
+        _, still_running = await asyncio.wait(workers.values(), timeout=OUTBOX_SHUTDOWN_TIMEOUT)
+        for task in still_running:
+            task.cancel()
+    await asyncio.gather(*workers.values(), return_exceptions=True)
+    flush_state()
 
     global _stopped_message_shown
     if not _stopped_message_shown:
         _stopped_message_shown = True
         info("Script stopped gracefully.")
 
+def build_shared(config: dict, twitter, bluesky) -> dict:
+    # State shared by every target: one Twitter session, one Bluesky client and
+    # a semaphore capping how many Twitter requests are in flight at once.
+    return {
+        "config": config,
+        "twitter": twitter,
+        "bluesky": bluesky,
+        "request_slots": asyncio.Semaphore(config["max_concurrent_requests"]),
+        "reinit_lock": asyncio.Lock(),
+        # handle -> (tweety User or user ID, resolved at); see resolve_user
+        "users": {},
+        # Outbox: (tweety object, poll timing) per queued tweet, targets being posted,
+        # worker wake-up
+        "pending_tweets": {},
+        "outbox_inflight": set(),
+        "outbox_event": asyncio.Event(),
+        "generation": 0,
+    }
+
 async def main():
     start_update_input_listener()
+    init_env_watch()
     config = load_config()
-    target_username = config["target_username"]
-    check_interval = config["check_interval"]
-    enable_translation = config["enable_translation"]
-    from_lang = config["translation_from"]
-    to_lang = config["translation_to"]
-    auto_update = config["auto_update"]
-    update_interval = config["update_interval"]
+    targets = config["targets"]
 
-    info(f"Target username: {target_username}")
+    info(f"Target usernames: {', '.join(t['username'] for t in targets)}")
 
-    if not target_username:
+    if not targets:
         error("TARGET_USER is not set in the environment variables.")
         return
 
+    store.init_store(STORE_FILE)
+    pruned = translation.prune(config["translation_cache_ttl"])
+    if pruned:
+        info(f"Pruned {pruned} expired translation(s) from the cache.")
+    migrate_legacy_state(targets)
+
+    configure_rate_limits(config)
     app = await init_twitter_app(config)
 
     process("Initializing BlueSky client...")
-    bluesky_client = init_bluesky_client()
-
-    await monitor_tweets(
-        app,
-        bluesky_client,
-        target_username,
-        check_interval,
-        enable_translation,
-        from_lang,
-        to_lang,
-        auto_update,
-        update_interval,
-    )
+    bluesky_client = await init_bluesky_client()
+
+    shared = build_shared(config, app, bluesky_client)
 
-# Run the async function
-asyncio.run(main())
+    if config["trace_enabled"]:
+        tracing.configure(TRACE_FILE, config["trace_max_bytes"], config["trace_backups"])
+    if config["metrics_port"]:
+        start_metrics(shared)
+        await metrics.start_server(config["metrics_host"], config["metrics_port"])
+
+    try:
+        await monitor_tweets(shared)
+    finally:
+        await metrics.stop_server()
+        tracing.shutdown()
+        media.shutdown_image_pool()
+        await media.close_http()
+        await translation.close_backend()
+
+# Run the async function. The guard keeps worker processes (media.prepare_image)
+# from starting the bot again when they import this module.
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,339 @@
+import asyncio
+import io
+import logging
+import mimetypes
+import multiprocessing
+import os
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import httpx
+from atproto import Session, models
+
+import ratelimit
+
+try:
+    from PIL import Image as PILImage
+    _PIL_AVAILABLE = True
+except ImportError:
+    _PIL_AVAILABLE = False
+
+# Media helpers for the Bluesky side of the bot.
+#
+# upload_blob_streaming sends a file to com.atproto.repo.uploadBlob straight from disk in
+# fixed-size chunks, so peak memory stays at roughly one chunk regardless of file size.
+# atproto's upload_blob only accepts bytes, which means holding the whole video in RAM.
+
+STREAM_CHUNK_SIZE = 256 * 1024
+# Files smaller than this are cheap to hold in memory and go through the atproto client
+STREAM_MIN_SIZE = 1024 * 1024
+
+# Bluesky rejects image blobs over 1,000,000 bytes; 2000px is the largest size clients show
+IMAGE_MAX_BYTES = 1_000_000
+IMAGE_MAX_DIMENSION = 2000
+IMAGE_POOL_WORKERS = max(1, min(2, os.cpu_count() or 1))
+
+_http: httpx.AsyncClient | None = None
+_image_pool: ProcessPoolExecutor | None = None
+
+
+class BlobUploadError(Exception):
+    def __init__(self, status_code: int, body: str):
+        super().__init__(f"uploadBlob returned HTTP {status_code}: {body}")
+        self.status_code = status_code
+        self.body = body
+
+    @property
+    def token_expired(self) -> bool:
+        return self.status_code in (400, 401) and "ExpiredToken" in self.body
+
+
+def _get_http() -> httpx.AsyncClient:
+    # One pooled client for every streaming upload
+    global _http
+    if _http is None:
+        _http = httpx.AsyncClient(timeout=httpx.Timeout(300, connect=15))
+    return _http
+
+
+def guess_mime_type(media_path: str, media_type: str) -> str:
+    mime_type, _ = mimetypes.guess_type(media_path)
+    if mime_type:
+        return mime_type
+    return "video/mp4" if media_type == "video" else "image/jpeg"
+
+
+async def iter_file_chunks(media_path: str, chunk_size: int = STREAM_CHUNK_SIZE):
+    # Reads happen in a worker thread so the event loop never waits on disk
+    f = await asyncio.to_thread(open, media_path, "rb")
+    try:
+        while True:
+            chunk = await asyncio.to_thread(f.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        f.close()
+
+
+async def upload_blob_streaming(bluesky_client, media_path: str, mime_type: str):
+    # Returns a models.ComAtprotoRepoUploadBlob.Response, like client.com.atproto.repo.upload_blob
+    session = Session.decode(bluesky_client.export_session_string())
+    # _base_url already points at the account's PDS after login
+    url = f"{bluesky_client._base_url.rstrip('/')}/com.atproto.repo.uploadBlob"
+    size = os.path.getsize(media_path)
+    headers = {
+        "Authorization": f"Bearer {session.access_jwt}",
+        "Content-Type": mime_type,
+        # An explicit length keeps httpx from falling back to chunked transfer encoding
+        "Content-Length": str(size),
+    }
+
+    await ratelimit.acquire("bluesky")
+    response = await _get_http().post(url, content=iter_file_chunks(media_path), headers=headers)
+    bucket = ratelimit.get_bucket("bluesky")
+    bucket.update_from_headers(response.headers)
+    if response.status_code == 429:
+        bucket.block_for(float(response.headers.get("ratelimit-reset", time.time() + 60)) - time.time())
+    if response.status_code != 200:
+        raise BlobUploadError(response.status_code, response.text)
+    logging.info(f"Streamed {size} bytes from {media_path} to uploadBlob")
+    return models.get_or_create(response.json(), models.ComAtprotoRepoUploadBlob.Response)
+
+
+async def download_to_buffer(url: str, spill_dir: str | None = None, spill_threshold: int | None = None,
+                             filename: str = "media.bin") -> bytes | str:
+    # Download url into memory. If spill_threshold is set and the body grows past it, the
+    # data so far is moved to spill_dir/filename and the rest streams there; the path is
+    # returned instead of bytes in that case.
+    buffer = bytearray()
+    spill_file = None
+    spill_path = None
+    try:
+        async with _get_http().stream("GET", url, follow_redirects=True) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(STREAM_CHUNK_SIZE):
+                if spill_file is None and spill_threshold is not None and spill_dir \
+                        and len(buffer) + len(chunk) > spill_threshold:
+                    spill_path = os.path.join(spill_dir, filename)
+                    spill_file = await asyncio.to_thread(open, spill_path, "wb")
+                    await asyncio.to_thread(spill_file.write, bytes(buffer))
+                    buffer = bytearray()
+                if spill_file is not None:
+                    await asyncio.to_thread(spill_file.write, chunk)
+                else:
+                    buffer.extend(chunk)
+    finally:
+        if spill_file is not None:
+            spill_file.close()
+    return spill_path if spill_path else bytes(buffer)
+
+
+def _open_source(media_source):
+    # Paths are opened for reading; in-memory buffers are wrapped without copying
+    if isinstance(media_source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(media_source)
+    return open(media_source, "rb")
+
+
+def _probe_jpeg(f) -> tuple[int, int] | None:
+    # Walk the marker segments, seeking past each one, until a start-of-frame marker
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        if code == 0xFF:
+            f.seek(-1, io.SEEK_CUR)
+            continue
+        if code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:
+            continue
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack(">H", length_bytes)[0]
+        if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            sof = f.read(5)
+            if len(sof) < 5:
+                return None
+            height, width = struct.unpack(">HH", sof[1:5])
+            return width, height
+        f.seek(length - 2, io.SEEK_CUR)
+
+
+def _probe_webp(header: bytes) -> tuple[int, int] | None:
+    chunk = header[12:16]
+    if chunk == b"VP8X" and len(header) >= 30:
+        width = 1 + int.from_bytes(header[24:27], "little")
+        height = 1 + int.from_bytes(header[27:30], "little")
+        return width, height
+    if chunk == b"VP8 " and len(header) >= 30:
+        width, height = struct.unpack("<HH", header[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(header) >= 25:
+        bits = int.from_bytes(header[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    return None
+
+
+def probe_image_size(media_source) -> tuple[int, int] | None:
+    # Read width/height from JPEG, PNG, GIF or WebP headers without decoding the image
+    try:
+        with _open_source(media_source) as f:
+            header = f.read(32)
+            if header[:8] == b"\x89PNG\r\n\x1a\n" and header[12:16] == b"IHDR":
+                return struct.unpack(">II", header[16:24])
+            if header[:6] in (b"GIF87a", b"GIF89a"):
+                return struct.unpack("<HH", header[6:10])
+            if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+                return _probe_webp(header)
+            if header[:2] == b"\xff\xd8":
+                return _probe_jpeg(f)
+    except (OSError, struct.error) as e:
+        logging.warning(f"Could not probe image dimensions: {e}")
+    return None
+
+
+def _iter_mp4_boxes(f, end: int | None):
+    # Yields (type, payload start, payload end) and seeks past every box, so large
+    # boxes such as mdat are skipped rather than read
+    while end is None or f.tell() < end:
+        start = f.tell()
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack(">I4s", header)
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+        elif size == 0:
+            f.seek(0, io.SEEK_END)
+            size = f.tell() - start
+            f.seek(start + 8)
+        if size < 8:
+            return
+        payload_start = f.tell()
+        yield box_type, payload_start, start + size
+        f.seek(start + size)
+
+
+def _parse_tkhd(f, payload_start: int) -> tuple[int, int] | None:
+    f.seek(payload_start)
+    version = f.read(1)[0]
+    # flags(3) + times/track_id/reserved/duration, then reserved(8) layer/group/volume/reserved(8)
+    f.seek(3 + (32 if version == 1 else 20) + 16, io.SEEK_CUR)
+    matrix = struct.unpack(">9i", f.read(36))
+    width, height = struct.unpack(">II", f.read(8))
+    width, height = width >> 16, height >> 16
+    if not width or not height:
+        return None
+    # A 90/270 degree rotation matrix has a == d == 0; clients display those swapped
+    if matrix[0] == 0 and matrix[4] == 0:
+        width, height = height, width
+    return width, height
+
+
+def probe_mp4_size(media_source) -> tuple[int, int] | None:
+    # Read display width/height of the first video track from moov/trak/tkhd in pure Python
+    try:
+        with _open_source(media_source) as f:
+            for box_type, payload_start, box_end in _iter_mp4_boxes(f, None):
+                if box_type != b"moov":
+                    continue
+                for trak_type, trak_start, trak_end in _iter_mp4_boxes(f, box_end):
+                    if trak_type != b"trak":
+                        continue
+                    for child_type, child_start, _ in _iter_mp4_boxes(f, trak_end):
+                        if child_type == b"tkhd":
+                            size = _parse_tkhd(f, child_start)
+                            if size:
+                                return size
+                            break
+                return None
+    except (OSError, struct.error, IndexError) as e:
+        logging.warning(f"Could not probe video dimensions: {e}")
+    return None
+
+
+def prepare_image_sync(data: bytes, max_bytes: int = IMAGE_MAX_BYTES,
+                       max_dimension: int = IMAGE_MAX_DIMENSION) -> tuple[bytes, int, int]:
+    # Runs in a worker process. Returns (image bytes, width, height), downscaling and
+    # re-encoding as JPEG only when the original is too large in bytes or pixels.
+    with PILImage.open(io.BytesIO(data)) as img:
+        width, height = img.size
+        if len(data) <= max_bytes and max(width, height) <= max_dimension:
+            return data, width, height
+
+        img = img.convert("RGB")
+        scale = min(1.0, max_dimension / max(width, height))
+        while True:
+            size = (max(1, int(width * scale)), max(1, int(height * scale)))
+            resized = img.resize(size, PILImage.LANCZOS) if size != img.size else img
+            for quality in (90, 80, 70, 60, 50):
+                out = io.BytesIO()
+                resized.save(out, format="JPEG", quality=quality, optimize=True)
+                if out.tell() <= max_bytes:
+                    return out.getvalue(), size[0], size[1]
+            scale *= 0.75
+
+
+def _get_image_pool() -> ProcessPoolExecutor:
+    global _image_pool
+    if _image_pool is None:
+        # Spawned, not forked: by now the process runs to_thread workers and the trace
+        # listener, and forking a multi-threaded process can deadlock on their locks
+        _image_pool = ProcessPoolExecutor(
+            max_workers=IMAGE_POOL_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _image_pool
+
+
+async def prepare_image(data: bytes) -> tuple[bytes, int | None, int | None]:
+    # Fit an image within Bluesky's blob limits without blocking the event loop.
+    # Without Pillow the data is returned untouched with whatever the header probe found.
+    size = probe_image_size(data)
+    if size and len(data) <= IMAGE_MAX_BYTES and max(size) <= IMAGE_MAX_DIMENSION:
+        # Already within limits: the header probe is enough, no worker process needed
+        return data, size[0], size[1]
+    if not _PIL_AVAILABLE:
+        return data, *(size or (None, None))
+    loop = asyncio.get_running_loop()
+    try:
+        prepared, width, height = await loop.run_in_executor(_get_image_pool(), prepare_image_sync, data)
+    except Exception as e:
+        logging.warning(f"Could not prepare image, uploading it unchanged: {e}")
+        return data, None, None
+    if len(prepared) != len(data):
+        logging.info(f"Recompressed image from {len(data)} to {len(prepared)} bytes ({width}x{height})")
+    return prepared, width, height
+
+
+def shutdown_image_pool() -> None:
+    global _image_pool
+    if _image_pool is not None:
+        _image_pool.shutdown(wait=False, cancel_futures=True)
+        _image_pool = None
+
+
+def media_size(media_source) -> int | None:
+    # Byte count of a path or in-memory buffer, for logs and traces
+    if isinstance(media_source, (bytes, bytearray)):
+        return len(media_source)
+    try:
+        return os.path.getsize(media_source)
+    except (OSError, TypeError):
+        return None
+
+
+def describe_media(media_source) -> str:
+    if isinstance(media_source, (bytes, bytearray)):
+        return f"{len(media_source)} byte buffer"
+    return str(media_source)
+
+
+async def close_http() -> None:
+    global _http
+    if _http is not None:
+        await _http.aclose()
+        _http = None
@@ -0,0 +1,141 @@
+import json
+import logging
+import os
+import re
+import time
+
+import store
+
+# Twitter -> Bluesky mention routing.
+#
+# MENTIONS_FILE is a JSON object mapping Twitter handles to Bluesky handles, ie:
+# {"CbsSportsGolazo": "cbssportsgolazo-m.bsky.social"}. refresh() resolves the Bluesky
+# handles to DIDs with app.bsky.actor.getProfiles, BATCH_SIZE handles per request, and
+# keeps the results in the store: found handles are re-checked after ttl, handles that
+# did not resolve after negative_ttl. refresh() runs from the supervisor loop; lookup()
+# is a dict read, so building a post never waits on the network.
+
+BATCH_SIZE = 25
+DEFAULT_TTL = 7 * 86400
+DEFAULT_NEGATIVE_TTL = 6 * 3600
+# After a failed refresh, wait this long before trying the network again
+RETRY_DELAY = 300
+
+_HANDLE_RE = re.compile(r"^([a-z0-9]([a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z]([a-z0-9-]{0,61}[a-z0-9])?$")
+
+# Twitter handle -> Bluesky handle, both lowercase
+_mapping: dict[str, str] = {}
+# Bluesky handle -> (DID or None, resolved at)
+_resolved: dict[str, tuple[str | None, float]] = {}
+# Twitter handle -> (Bluesky handle, DID); the only table lookup() reads
+_routes: dict[str, tuple[str, str]] = {}
+_file_signature = None
+_cache_loaded = False
+_retry_at = 0.0
+
+
+def _signature(path: str) -> tuple | None:
+    try:
+        st = os.stat(path)
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+def _rebuild_routes() -> None:
+    # Stale DIDs keep routing until a refresh replaces them; DIDs rarely change
+    global _routes
+    _routes = {
+        twitter: (bluesky, _resolved[bluesky][0])
+        for twitter, bluesky in _mapping.items()
+        if bluesky in _resolved and _resolved[bluesky][0]
+    }
+
+
+def load_mapping(path: str | None) -> bool:
+    # Re-reads the mapping file only when it changed. Returns True if the mapping changed.
+    global _mapping, _file_signature
+    signature = _signature(path) if path else None
+    if signature == _file_signature:
+        return False
+    _file_signature = signature
+
+    mapping = {}
+    if signature is not None:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            for twitter, bluesky in entries.items():
+                mapping[twitter.lstrip("@").lower()] = str(bluesky).lstrip("@").lower()
+        except (OSError, ValueError, AttributeError) as e:
+            logging.error(f"Could not read mention mapping {path}: {e}")
+            return False
+        logging.info(f"Loaded {len(mapping)} mention mapping(s) from {path}")
+    _mapping = mapping
+    _rebuild_routes()
+    return True
+
+
+def lookup(twitter_handle: str) -> tuple[str, str] | None:
+    # (Bluesky handle, DID) for a mapped and resolved Twitter handle, else None
+    return _routes.get(twitter_handle.lower())
+
+
+def stale_handles(ttl: float, negative_ttl: float, now: float | None = None) -> list[str]:
+    now = now or time.time()
+    stale = []
+    for handle in sorted(set(_mapping.values())):
+        entry = _resolved.get(handle)
+        if entry is None or now - entry[1] > (ttl if entry[0] else negative_ttl):
+            stale.append(handle)
+    return stale
+
+
+async def resolve_batch(bluesky_client, handles: list[str]) -> dict[str, str | None]:
+    # One getProfiles call; handles missing from the response did not resolve
+    resolved = {handle: None for handle in handles}
+    valid = [h for h in handles if _HANDLE_RE.match(h)]
+    if valid:
+        response = await bluesky_client.app.bsky.actor.get_profiles(params={"actors": valid})
+        for profile in response.profiles:
+            handle = profile.handle.lower()
+            if handle in resolved:
+                resolved[handle] = profile.did
+    return resolved
+
+
+async def refresh(bluesky_client, path: str | None, ttl: float = DEFAULT_TTL,
+                  negative_ttl: float = DEFAULT_NEGATIVE_TTL) -> int:
+    # Resolves mapped handles that are new or past their TTL. Cheap when nothing is stale.
+    # Returns the number of handles looked up.
+    global _retry_at, _cache_loaded
+    if not _cache_loaded:
+        _resolved.update(store.get_cached_mentions())
+        _cache_loaded = True
+        _rebuild_routes()
+    load_mapping(path)
+
+    now = time.time()
+    if now < _retry_at:
+        return 0
+    stale = stale_handles(ttl, negative_ttl, now)
+    looked_up = 0
+    for i in range(0, len(stale), BATCH_SIZE):
+        batch = stale[i:i + BATCH_SIZE]
+        try:
+            resolved = await resolve_batch(bluesky_client, batch)
+        except Exception as e:
+            logging.warning(f"Could not resolve mention handles: {e}")
+            _retry_at = time.time() + RETRY_DELAY
+            break
+        resolved_at = time.time()
+        store.put_cached_mentions(resolved, resolved_at)
+        _resolved.update({handle: (did, resolved_at) for handle, did in resolved.items()})
+        looked_up += len(batch)
+        missing = [handle for handle, did in resolved.items() if not did]
+        if missing:
+            logging.warning(f"Mention mapping: no Bluesky account for {', '.join(missing)}")
+    if looked_up:
+        _rebuild_routes()
+        logging.info(f"Resolved {looked_up} mention handle(s); {len(_routes)} mention(s) routed to Bluesky")
+    return looked_up
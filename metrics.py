@@ -0,0 +1,177 @@
+import asyncio
+import bisect
+import contextlib
+import logging
+import time
+
+# Optional Prometheus-style metrics, served as plain text from a tiny asyncio HTTP
+# server (no extra dependency). Nothing is recorded until enable() is called: stage()
+# then hands out a shared no-op context manager and inc()/observe() return at once.
+#
+# Gauges that are cheap to read on demand (queue depth, rate-limit budget, polling
+# intervals) are not tracked at all; collectors registered with add_collector() are
+# called only when /metrics is scraped.
+
+PREFIX = "t2b"
+# Seconds; covers fast API calls up to long video uploads and catch-up lag
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900, 3600)
+
+_enabled = False
+_counters: dict[tuple, float] = {}
+# (name, labels) -> [bucket counts..., sum, count]
+_histograms: dict[tuple, list] = {}
+_help: dict[str, tuple[str, str]] = {}
+_collectors: list = []
+_server: asyncio.AbstractServer | None = None
+_noop = contextlib.nullcontext()
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable() -> None:
+    global _enabled
+    _enabled = True
+
+
+def describe(name: str, kind: str, text: str) -> None:
+    _help[name] = (kind, text)
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return (name, tuple(sorted(labels.items())))
+
+
+def inc(name: str, amount: float = 1, **labels) -> None:
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name: str, value: float, **labels) -> None:
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    hist = _histograms.get(key)
+    if hist is None:
+        hist = _histograms[key] = [0] * (len(BUCKETS) + 2)
+    hist[bisect.bisect_left(BUCKETS, value)] += 1
+    hist[-2] += value
+    hist[-1] += 1
+
+
+class _StageTimer:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        observe(f"{PREFIX}_stage_duration_seconds", elapsed, stage=self.stage)
+        if exc_type is not None and not issubclass(exc_type, asyncio.CancelledError):
+            inc(f"{PREFIX}_stage_errors_total", stage=self.stage)
+        return False
+
+
+def stage(name: str):
+    # with metrics.stage("upload_media"): ... records duration and errors for the stage
+    return _StageTimer(name) if _enabled else _noop
+
+
+def add_collector(collector) -> None:
+    # collector() returns [(name, labels dict, value), ...] of gauges, read at scrape time
+    _collectors.append(collector)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _header(lines: list, seen: set, name: str, kind: str) -> None:
+    if name in seen:
+        return
+    seen.add(name)
+    kind, text = _help.get(name, (kind, ""))
+    if text:
+        lines.append(f"# HELP {name} {text}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def render() -> str:
+    lines = []
+    seen = set()
+    for (name, labels), value in sorted(_counters.items()):
+        _header(lines, seen, name, "counter")
+        lines.append(f"{name}{_format_labels(labels)} {value:g}")
+
+    for (name, labels), hist in sorted(_histograms.items()):
+        _header(lines, seen, name, "histogram")
+        cumulative = 0
+        for bound, count in zip((*BUCKETS, "+Inf"), hist[:-2]):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels((*labels, ('le', str(bound))))} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {hist[-2]:.6f}")
+        lines.append(f"{name}_count{_format_labels(labels)} {hist[-1]}")
+
+    for collector in _collectors:
+        try:
+            samples = collector()
+        except Exception as e:
+            logging.warning(f"Metrics collector failed: {e}")
+            continue
+        for name, labels, value in samples:
+            if value is None:
+                continue
+            _header(lines, seen, name, "gauge")
+            lines.append(f"{name}{_format_labels(tuple(sorted(labels.items())))} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), 10)
+        # Drain the headers; the request body (if any) is ignored
+        while (await asyncio.wait_for(reader.readline(), 10)) not in (b"\r\n", b"\n", b""):
+            pass
+        parts = request_line.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] in ("/metrics", "/"):
+            status, body = "200 OK", render().encode("utf-8")
+        else:
+            status, body = "404 Not Found", b"Not found\n"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(host: str, port: int) -> None:
+    global _server
+    enable()
+    _server = await asyncio.start_server(_handle, host, port)
+    logging.info(f"Metrics available at http://{host}:{port}/metrics")
+
+
+async def stop_server() -> None:
+    global _server
+    if _server is not None:
+        _server.close()
+        await _server.wait_closed()
+        _server = None
@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import time
+
+# Token-bucket request governor, one bucket per service.
+#
+# Buckets refill continuously at limit/window. Bluesky responses carry ratelimit-limit,
+# ratelimit-remaining and ratelimit-reset headers; update_from_headers lines the bucket
+# up with the server's view, so calls are delayed before the quota runs out rather than
+# failing with a 429. A 429 (or tweety's RateLimitReached) blocks the bucket until reset.
+
+# Keep this many requests in reserve; below it, callers wait for the reset instead
+RESERVE = 2
+
+
+class TokenBucket:
+    def __init__(self, name: str, limit: int, window: float):
+        self.name = name
+        self.limit = max(1, limit)
+        self.window = window
+        self.tokens = float(self.limit)
+        self.blocked_until = 0.0
+        self.server_remaining: int | None = None
+        self.server_reset: float | None = None
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.limit, self.tokens + (now - self._updated) * self.limit / self.window)
+        self._updated = now
+
+    def _wait_time(self) -> float:
+        self._refill()
+        wait = max(0.0, self.blocked_until - time.monotonic())
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) * self.window / self.limit)
+        return wait
+
+    async def acquire(self) -> None:
+        # Waits until a request may be sent, then spends one token
+        async with self._lock:
+            wait = self._wait_time()
+            if wait > 0:
+                logging.info(f"Rate limit governor: delaying {self.name} request {wait:.1f}s")
+                await asyncio.sleep(wait)
+                self._refill()
+            self.tokens = max(0.0, self.tokens - 1)
+
+    def update_from_headers(self, headers) -> None:
+        try:
+            limit = headers.get("ratelimit-limit")
+            remaining = headers.get("ratelimit-remaining")
+            reset = headers.get("ratelimit-reset")
+            if remaining is None:
+                return
+            remaining = int(remaining)
+            if limit is not None:
+                self.limit = max(1, int(limit))
+        except (TypeError, ValueError):
+            return
+        self._refill()
+        self.tokens = min(self.tokens, float(remaining))
+        self.server_remaining = remaining
+        if reset is not None:
+            try:
+                # ratelimit-reset is a unix timestamp
+                self.server_reset = float(reset)
+            except ValueError:
+                self.server_reset = None
+        if remaining <= RESERVE and self.server_reset:
+            self.block_for(self.server_reset - time.time())
+
+    def block_for(self, seconds: float) -> None:
+        seconds = max(0.0, seconds)
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+        logging.warning(f"Rate limit governor: {self.name} blocked for {seconds:.0f}s")
+
+    def snapshot(self) -> dict:
+        self._refill()
+        return {
+            "limit": self.limit,
+            "remaining": int(self.tokens),
+            "server_remaining": self.server_remaining,
+            "blocked_for": round(max(0.0, self.blocked_until - time.monotonic()), 1),
+        }
+
+
+_buckets: dict[str, TokenBucket] = {}
+
+
+def configure(name: str, limit: int, window: float) -> TokenBucket:
+    bucket = _buckets.get(name)
+    if bucket is None:
+        bucket = _buckets[name] = TokenBucket(name, limit, window)
+    elif bucket.window != window or (bucket.server_remaining is None and bucket.limit != limit):
+        bucket.limit, bucket.window = max(1, limit), window
+    return bucket
+
+
+def get_bucket(name: str) -> TokenBucket:
+    return _buckets.get(name) or configure(name, 60, 60)
+
+
+async def acquire(name: str) -> None:
+    await get_bucket(name).acquire()
+
+
+def snapshot() -> dict[str, dict]:
+    # Remaining budget per service, e.g. for logs or a metrics endpoint
+    return {name: bucket.snapshot() for name, bucket in _buckets.items()}
+
+
+def install_httpx_hooks(http_client, name: str) -> bool:
+    # Throttle every request made through an httpx.AsyncClient and learn from its
+    # responses. Returns False if the object has no event hooks to attach to.
+    hooks = getattr(http_client, "event_hooks", None)
+    if hooks is None:
+        return False
+
+    async def on_request(request):
+        await acquire(name)
+
+    async def on_response(response):
+        bucket = get_bucket(name)
+        bucket.update_from_headers(response.headers)
+        if response.status_code == 429:
+            reset = response.headers.get("ratelimit-reset")
+            retry_after = response.headers.get("retry-after")
+            try:
+                seconds = float(reset) - time.time() if reset else float(retry_after or 60)
+            except ValueError:
+                seconds = 60
+            bucket.block_for(seconds)
+
+    hooks["request"] = [*hooks.get("request", []), on_request]
+    hooks["response"] = [*hooks.get("response", []), on_response]
+    http_client.event_hooks = hooks
+    return True
@@ -0,0 +1,249 @@
+import re
+import unicodedata
+
+# Local checks for Bluesky post records, so a record that would be rejected never costs
+# a network call (or a media upload). Limits come from the app.bsky.feed.post lexicon.
+
+MAX_GRAPHEMES = 300
+MAX_BYTES = 3000
+MAX_TAG_BYTES = 640
+MAX_TAG_GRAPHEMES = 64
+LINK_DISPLAY_LENGTH = 30
+# A text cut that would leave fewer graphemes than this in a post that already holds
+# other tokens moves the text to the next post instead
+MIN_SPLIT_GRAPHEMES = 20
+
+_ZWJ = "\u200d"
+
+
+class PostValidationError(ValueError):
+    pass
+
+
+# Tokenizer. Links, mentions and hashtags are matched by one precompiled alternation, so
+# each tweet is scanned once and the scan yields the final tokens: t.co links are expanded
+# or dropped in the link branch, and space runs are collapsed in the text between matches.
+# A match is classified by its first character. The only lookarounds are the handle
+# checks, placed after the "@" so they run at "@" positions only (a lookbehind at the
+# start of the pattern would run at every position and slows the scan down by half).
+# Trailing punctuation is trimmed off links and tags afterwards ("see https://x.y.").
+_TOKEN_RE = re.compile(r"(https?://\S+[ \t]*|@(?<![\w@.]@)[A-Za-z0-9_]{1,15}(?![A-Za-z0-9_@])|#[^\s#]+)")
+_SPACES_RE = re.compile("  +")
+_LINK_TRAILING = ".,!?:;)]\"'"
+_TAG_TRAILING = ".,!?:;"
+
+
+def shorten_url(url: str, length: int = LINK_DISPLAY_LENGTH) -> str:
+    display = url.split("://", 1)[-1]
+    return display if len(display) <= length else display[:length - 1] + "…"
+
+
+def tokenize(text: str, urls: dict[str, str] | None = None) -> list[tuple[str, str, str | None]]:
+    # Splits a tweet into (kind, display, value) tokens, kind being text, tag, mention or
+    # link. value is the tag name, the handle or the full URL (None for plain text).
+    # t.co links found in urls are expanded, other t.co links (media attachments) are
+    # dropped, "RT " becomes a repost emoji, tabs and space runs collapse to one space
+    # (newlines are kept) and the text is stripped.
+    if text.startswith("RT "):
+        text = "🔁 " + text[3:]
+    if "\t" in text:
+        text = text.replace("\t", " ")
+    # re.split does the scan in C and alternates plain text with matches
+    parts = iter(_TOKEN_RE.split(text.strip()))
+    tokens = []
+    append = tokens.append
+    pending = next(parts)
+    for raw, after in zip(parts, parts):
+        first = raw[0]
+        if first == "#":
+            display = raw.rstrip(_TAG_TRAILING)
+            value = display[1:]
+            # Graphemes and bytes are only counted when the code point count is close
+            if not value or (len(value) > MAX_TAG_GRAPHEMES and (
+                    len(value.encode("utf-8")) > MAX_TAG_BYTES or grapheme_count(value) > MAX_TAG_GRAPHEMES)):
+                pending += raw + after
+                continue
+            token = ("tag", display, value)
+            after = raw[len(display):] + after
+        elif first == "@":
+            token = ("mention", raw, raw[1:])
+        else:
+            url = raw.rstrip()
+            value = url.rstrip(_LINK_TRAILING)
+            if urls and value in urls:
+                after = url[len(value):] + raw[len(url):] + after
+                value = urls[value]
+            elif "://t.co/" in value:
+                # Dropped with the spaces after it
+                pending += after
+                continue
+            else:
+                after = raw[len(value):] + after
+            token = ("link", shorten_url(value), value)
+
+        if pending:
+            if "  " in pending:
+                pending = _SPACES_RE.sub(" ", pending)
+            append(("text", pending, None))
+        append(token)
+        pending = after
+    pending = pending.rstrip()
+    if pending:
+        if "  " in pending:
+            pending = _SPACES_RE.sub(" ", pending)
+        append(("text", pending, None))
+    # Text left at the front by a dropped leading t.co link ("https://t.co/x \nhi")
+    if tokens and tokens[0][0] == "text" and tokens[0][1][0].isspace():
+        lead = tokens[0][1].lstrip()
+        if lead:
+            tokens[0] = ("text", lead, None)
+        else:
+            del tokens[0]
+    return tokens
+
+
+def plain_text(tokens: list[tuple[str, str, str | None]]) -> str:
+    # The cleaned text, with links written out in full (for logs and translation)
+    return "".join(value if kind == "link" else display for kind, display, value in tokens)
+
+
+def _is_extender(ch: str) -> bool:
+    # Code points that attach to the previous grapheme: combining marks, variation
+    # selectors, emoji skin-tone modifiers and tag characters (flag subdivisions)
+    cp = ord(ch)
+    return (
+        unicodedata.category(ch) in ("Mn", "Me", "Mc")
+        or 0xFE00 <= cp <= 0xFE0F
+        or 0x1F3FB <= cp <= 0x1F3FF
+        or 0xE0020 <= cp <= 0xE007F
+    )
+
+
+def _is_regional_indicator(ch: str) -> bool:
+    return 0x1F1E6 <= ord(ch) <= 0x1F1FF
+
+
+def split_graphemes(text: str) -> list[str]:
+    # Approximates extended grapheme clusters (UAX #29) for the cases that matter in
+    # tweets: combining marks, emoji ZWJ sequences, modifiers, flags and CRLF
+    clusters = []
+    i = 0
+    n = len(text)
+    while i < n:
+        start = i
+        ch = text[i]
+        i += 1
+        if ch == "\r" and i < n and text[i] == "\n":
+            i += 1
+        elif _is_regional_indicator(ch) and i < n and _is_regional_indicator(text[i]):
+            i += 1
+        else:
+            while i < n:
+                if _is_extender(text[i]):
+                    i += 1
+                elif text[i] == _ZWJ:
+                    i += 2 if i + 1 < n else 1
+                else:
+                    break
+        clusters.append(text[start:i])
+    return clusters
+
+
+def grapheme_count(text: str) -> int:
+    return len(split_graphemes(text))
+
+
+def _cut_text(graphemes: list[str], room: int, room_bytes: int, newline_from: int, hard: bool) -> int:
+    # Number of graphemes of a text token to keep in the current post: up to a line break
+    # (if it leaves the post at least half full), else up to a space. Mid-word only when
+    # hard, i.e. the word does not fit an empty post; otherwise 0 moves it to the next post.
+    size = 0
+    fit = 0
+    for g in graphemes[:room]:
+        size += len(g.encode("utf-8"))
+        if size > room_bytes:
+            break
+        fit += 1
+    newline = max((i for i in range(fit) if "\n" in graphemes[i]), default=-1)
+    space = max((i for i in range(fit + 1) if graphemes[i].isspace()), default=-1)
+    if newline >= max(newline_from, 1):
+        return newline
+    if space > 0 and (hard or space >= MIN_SPLIT_GRAPHEMES):
+        return space
+    return fit if hard else 0
+
+
+def _close_post(post: list) -> list:
+    if post and post[-1][0] == "text":
+        last = post[-1][1].rstrip()
+        post[-1] = ("text", last, None)
+        if not last:
+            post.pop()
+    return post
+
+
+def split_tokens(tokens: list[tuple[str, str, str | None]], max_graphemes: int = MAX_GRAPHEMES,
+                 max_bytes: int = MAX_BYTES) -> list[list[tuple[str, str, str | None]]]:
+    # Groups tokens into posts that each fit the limits, measured on the display text that
+    # will be posted (a routed mention can be longer than the tweet's @handle). Links,
+    # mentions and tags are never cut; text is cut on grapheme boundaries, at a line break,
+    # then a space, and mid-word only for a word longer than a whole post. Every post but
+    # the last is filled, so the thread length follows the text length.
+    posts = []
+    post = []
+    used = size = 0
+    stack = tokens[::-1]
+    while stack:
+        kind, display, value = stack.pop()
+        if kind == "text" and not post:
+            display = display.lstrip()
+            if not display:
+                continue
+        graphemes = split_graphemes(display)
+        data = len(display.encode("utf-8"))
+        if used + len(graphemes) <= max_graphemes and size + data <= max_bytes:
+            post.append((kind, display, value))
+            used += len(graphemes)
+            size += data
+            continue
+
+        if kind == "text":
+            cut = _cut_text(graphemes, max_graphemes - used, max_bytes - size, max_graphemes // 2 - used, not post)
+            if not cut and not post:
+                raise PostValidationError(f"Text '{display[:20]}...' cannot be split to fit a post")
+            if cut:
+                post.append(("text", "".join(graphemes[:cut]), None))
+            stack.append(("text", "".join(graphemes[cut:]), None))
+        elif not post:
+            raise PostValidationError(f"{kind.capitalize()} '{display[:20]}...' is longer than a whole post")
+        else:
+            stack.append((kind, display, value))
+        posts.append(_close_post(post))
+        post = []
+        used = size = 0
+    if post:
+        posts.append(_close_post(post))
+    return [post for post in posts if post]
+
+
+def validate_record(text: str, facets) -> None:
+    # Raises PostValidationError for anything the PDS would reject
+    data = text.encode("utf-8")
+    graphemes = grapheme_count(text)
+    if graphemes > MAX_GRAPHEMES:
+        raise PostValidationError(f"Record/text must not be longer than {MAX_GRAPHEMES} graphemes (got {graphemes})")
+    if len(data) > MAX_BYTES:
+        raise PostValidationError(f"Record/text must not be longer than {MAX_BYTES} bytes (got {len(data)})")
+
+    for facet in facets or []:
+        start, end = facet.index.byte_start, facet.index.byte_end
+        if not (0 <= start < end <= len(data)):
+            raise PostValidationError(f"Facet byte range {start}-{end} is outside the {len(data)} byte text")
+        # Both ends must sit on UTF-8 character boundaries (not on a continuation byte)
+        for pos in (start, end):
+            if pos < len(data) and (data[pos] & 0xC0) == 0x80:
+                raise PostValidationError(f"Facet byte offset {pos} splits a UTF-8 character")
+        for feature in facet.features:
+            tag = getattr(feature, "tag", None)
+            if tag is not None and (len(tag.encode("utf-8")) > MAX_TAG_BYTES or grapheme_count(tag) > MAX_TAG_GRAPHEMES):
+                raise PostValidationError(f"Tag '{tag[:20]}...' is longer than the lexicon allows")
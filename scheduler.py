@@ -0,0 +1,55 @@
+import random
+import statistics
+from datetime import datetime, timezone
+
+# Adaptive polling: picks each target's next check interval from its recent posting
+# cadence. While a target is active (it tweets more often than the base interval and its
+# last tweet is recent compared to its usual gap) polling speeds up; otherwise every idle
+# poll doubles the interval.
+# The result is always clamped to [min_interval, max_interval] and jittered so targets
+# do not poll in lockstep.
+
+RECENT_TWEETS = 10
+JITTER = 0.1
+
+
+def median_gap(timestamps: list[datetime]) -> float | None:
+    # Median seconds between consecutive tweets among the most recent RECENT_TWEETS
+    recent = sorted(timestamps)[-RECENT_TWEETS:]
+    gaps = [(b - a).total_seconds() for a, b in zip(recent, recent[1:])]
+    gaps = [g for g in gaps if g > 0]
+    return statistics.median(gaps) if gaps else None
+
+
+def next_interval(base_interval: float, timestamps: list[datetime], idle_polls: int,
+                  min_interval: float, max_interval: float, now: datetime | None = None,
+                  jitter: float = JITTER) -> float:
+    now = now or datetime.now(timezone.utc)
+    gap = median_gap(timestamps)
+    last_tweet = max(timestamps) if timestamps else None
+
+    if (gap is not None and gap / 2 < base_interval and last_tweet is not None
+            and (now - last_tweet).total_seconds() <= 2 * gap):
+        # Active: poll about twice per typical gap so a new tweet waits at most half a gap.
+        # Accounts whose gap is longer than that never count as active, or a twice-a-week
+        # poster would sit at base_interval forever and never back off.
+        interval = gap / 2
+    else:
+        # Idle: back off exponentially from the configured interval
+        interval = base_interval * (2 ** min(idle_polls, 16))
+
+    interval = max(min_interval, min(max_interval, interval))
+    interval *= 1 + random.uniform(-jitter, jitter)
+    return max(min_interval, min(max_interval, interval))
+
+
+def tweet_timestamps(tweets) -> list[datetime]:
+    # tweety exposes the creation time as created_on (older releases: date)
+    timestamps = []
+    for tweet in tweets:
+        created = getattr(tweet, "created_on", None) or getattr(tweet, "date", None)
+        if isinstance(created, datetime):
+            if created.tzinfo is None:
+                created = created.replace(tzinfo=timezone.utc)
+            timestamps.append(created)
+    return timestamps
@@ -48,7 +48,7 @@ def create_env_file():
     rapidapi_key = prompt_user_for_input("Enter your RAPIDAPI key: ")
     bluesky_username = prompt_user_for_input("Enter your Bluesky handle/username (ie: user.bsky.social): ")
     bluesky_password = prompt_user_for_input("Enter your Bluesky app-password: ")
-    target_user = prompt_user_for_input("Enter the target Twitter user (without the @, ie: 'Yopro20_): ")
+    target_user = prompt_user_for_input("Enter the target Twitter user(s) (without the @, comma-separated, ie: 'Yopro20_,OtherUser'): ")
     check_interval = prompt_for_integer("Enter the interval (in seconds) to check for new posts: ")
 
     enable_translation_input = prompt_user_for_input("Do you want to enable translation? (yes/no): ").lower()
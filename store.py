@@ -0,0 +1,355 @@
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+# SQLite index of mirrored tweets. Every tweet the bot handles gets one row keyed by
+# its numeric ID, so duplicate checks are a primary-key lookup instead of a string
+# comparison, and each post is a single-row transaction instead of a full file rewrite.
+
+STATUS_QUEUED = "queued"
+STATUS_POSTED = "posted"
+# Some of the tweet's posts exist; the outbox retry carries on from its checkpoint
+STATUS_PARTIAL = "partial"
+STATUS_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tweets (
+    tweet_id INTEGER PRIMARY KEY,
+    target TEXT NOT NULL,
+    status TEXT NOT NULL,
+    post_uri TEXT,
+    post_cid TEXT,
+    root_uri TEXT,
+    root_cid TEXT,
+    tail_uri TEXT,
+    tail_cid TEXT,
+    posts_done INTEGER,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tweets_target ON tweets (target, tweet_id);
+CREATE TABLE IF NOT EXISTS targets (
+    username TEXT PRIMARY KEY,
+    last_tweet_id INTEGER
+);
+CREATE TABLE IF NOT EXISTS translations (
+    cache_key TEXT PRIMARY KEY,
+    translation TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS translations_created ON translations (created_at);
+CREATE TABLE IF NOT EXISTS users (
+    handle TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    name TEXT,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS mentions (
+    handle TEXT PRIMARY KEY,
+    did TEXT,
+    resolved_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outbox (
+    tweet_id INTEGER PRIMARY KEY,
+    target TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    dead INTEGER NOT NULL DEFAULT 0,
+    enqueued_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_ready ON outbox (dead, target, tweet_id);
+"""
+
+# Columns added after the first release; init_store adds them to older databases
+_MIGRATIONS = {
+    "tweets": ["root_uri TEXT", "root_cid TEXT", "tail_uri TEXT", "tail_cid TEXT", "posts_done INTEGER"],
+}
+
+_conn: sqlite3.Connection | None = None
+_lock = threading.Lock()
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def init_store(path: str) -> None:
+    global _conn
+    if _conn is not None:
+        return
+    _conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    _conn.row_factory = sqlite3.Row
+    # WAL keeps readers unblocked and makes each commit a small append
+    _conn.execute("PRAGMA journal_mode=WAL")
+    _conn.execute("PRAGMA synchronous=NORMAL")
+    _conn.executescript(_SCHEMA)
+    for table, columns in _MIGRATIONS.items():
+        existing = {row["name"] for row in _conn.execute(f"PRAGMA table_info({table})")}
+        for column in columns:
+            if column.split()[0] not in existing:
+                _conn.execute(f"ALTER TABLE {table} ADD COLUMN {column}")
+    logging.info(f"Opened tweet index at {path}")
+
+
+def _db() -> sqlite3.Connection:
+    if _conn is None:
+        raise RuntimeError("Tweet store is not initialized. Call init_store() first.")
+    return _conn
+
+
+def _write(sql: str, params: tuple = ()) -> None:
+    _write_many([(sql, params)])
+
+
+def _write_many(statements: list[tuple[str, tuple]]) -> None:
+    # Run statements in one transaction: either all of them land or none do
+    conn = _db()
+    with _lock:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params in statements:
+                conn.execute(sql, params)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+def get_last_tweet_id(username: str) -> int | None:
+    row = _db().execute(
+        "SELECT last_tweet_id FROM targets WHERE username = ?", (username.lower(),)
+    ).fetchone()
+    return row["last_tweet_id"] if row else None
+
+
+def set_last_tweet_id(username: str, tweet_id) -> None:
+    # Only ever moves the watermark forward
+    _write(*_advance_watermark_sql(username, tweet_id))
+
+
+def get_tweet(tweet_id) -> dict | None:
+    row = _db().execute("SELECT * FROM tweets WHERE tweet_id = ?", (int(tweet_id),)).fetchone()
+    return dict(row) if row else None
+
+
+def is_posted(tweet_id) -> bool:
+    row = _db().execute(
+        "SELECT 1 FROM tweets WHERE tweet_id = ? AND status = ?", (int(tweet_id), STATUS_POSTED)
+    ).fetchone()
+    return row is not None
+
+
+def get_thread_ref(tweet_id) -> dict | None:
+    # Strong refs for replying under a mirrored tweet: its thread's root post and the
+    # last post it produced (a long tweet becomes several). A primary-key lookup.
+    row = _db().execute(
+        "SELECT post_uri, post_cid, root_uri, root_cid, tail_uri, tail_cid FROM tweets "
+        "WHERE tweet_id = ? AND status = ? AND post_uri IS NOT NULL AND post_cid IS NOT NULL",
+        (int(tweet_id), STATUS_POSTED),
+    ).fetchone()
+    if row is None:
+        return None
+    return {
+        "root": (row["root_uri"] or row["post_uri"], row["root_cid"] or row["post_cid"]),
+        "parent": (row["tail_uri"] or row["post_uri"], row["tail_cid"] or row["post_cid"]),
+    }
+
+
+def get_progress(tweet_id) -> dict | None:
+    # Checkpoint of a tweet posted part-way: its first post, the last post made so far and
+    # how many posts exist, or None if no attempt got as far as a first post
+    row = _db().execute(
+        "SELECT post_uri, post_cid, tail_uri, tail_cid, posts_done FROM tweets "
+        "WHERE tweet_id = ? AND status = ? AND post_uri IS NOT NULL AND post_cid IS NOT NULL",
+        (int(tweet_id), STATUS_PARTIAL),
+    ).fetchone()
+    if row is None:
+        return None
+    return {
+        "first": (row["post_uri"], row["post_cid"]),
+        "tail": (row["tail_uri"] or row["post_uri"], row["tail_cid"] or row["post_cid"]),
+        "posts_done": row["posts_done"] or 1,
+    }
+
+
+def save_progress(tweet_id, target: str, first: tuple, tail: tuple, posts_done: int) -> None:
+    # first/tail are (uri, cid); the outbox row stays until complete_outbox
+    _write_many([
+        _upsert_tweet_sql(tweet_id, target, STATUS_PARTIAL, first[0], first[1], tail=tail),
+        ("UPDATE tweets SET posts_done = ? WHERE tweet_id = ?", (posts_done, int(tweet_id))),
+    ])
+
+
+def _upsert_tweet_sql(tweet_id, target: str, status: str, post_uri, post_cid,
+                      root: tuple | None = None, tail: tuple | None = None) -> tuple[str, tuple]:
+    # root/tail are (uri, cid); None means the post itself
+    now = _now()
+    root_uri, root_cid = root or (None, None)
+    tail_uri, tail_cid = tail or (None, None)
+    return (
+        "INSERT INTO tweets (tweet_id, target, status, post_uri, post_cid, root_uri, root_cid, "
+        "tail_uri, tail_cid, created_at, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(tweet_id) DO UPDATE SET status = excluded.status, "
+        "post_uri = COALESCE(excluded.post_uri, post_uri), "
+        "post_cid = COALESCE(excluded.post_cid, post_cid), "
+        "root_uri = COALESCE(excluded.root_uri, root_uri), "
+        "root_cid = COALESCE(excluded.root_cid, root_cid), "
+        "tail_uri = COALESCE(excluded.tail_uri, tail_uri), "
+        "tail_cid = COALESCE(excluded.tail_cid, tail_cid), "
+        "updated_at = excluded.updated_at",
+        (int(tweet_id), target.lower(), status, post_uri, post_cid, root_uri, root_cid,
+         tail_uri, tail_cid, now, now),
+    )
+
+
+def _advance_watermark_sql(target: str, tweet_id) -> tuple[str, tuple]:
+    return (
+        "INSERT INTO targets (username, last_tweet_id) VALUES (?, ?) "
+        "ON CONFLICT(username) DO UPDATE SET last_tweet_id = "
+        "MAX(COALESCE(last_tweet_id, 0), excluded.last_tweet_id)",
+        (target.lower(), int(tweet_id)),
+    )
+
+
+# Outbox: tweets waiting to be posted. The poller enqueues and advances the watermark in
+# one transaction; posting workers claim rows, and either complete them, schedule a
+# retry with backoff, or move them to the dead-letter list (dead = 1).
+
+def enqueue_outbox(tweet_id, target: str) -> None:
+    now = time.time()
+    _write_many([
+        (
+            "INSERT OR IGNORE INTO outbox (tweet_id, target, next_attempt_at, enqueued_at) VALUES (?, ?, ?, ?)",
+            (int(tweet_id), target.lower(), now, now),
+        ),
+        _upsert_tweet_sql(tweet_id, target, STATUS_QUEUED, None, None),
+        _advance_watermark_sql(target, tweet_id),
+    ])
+
+
+def claim_outbox(exclude_targets: set[str]) -> dict | None:
+    # Oldest ready row whose target has no earlier live row and is not being posted by
+    # another worker, so each target's tweets are posted strictly in order
+    placeholders = ",".join("?" for _ in exclude_targets)
+    exclude_sql = f"AND o.target NOT IN ({placeholders})" if exclude_targets else ""
+    row = _db().execute(
+        "SELECT o.* FROM outbox o WHERE o.dead = 0 AND o.next_attempt_at <= ? "
+        f"{exclude_sql} "
+        "AND o.tweet_id = (SELECT MIN(tweet_id) FROM outbox WHERE target = o.target AND dead = 0) "
+        "ORDER BY o.next_attempt_at, o.tweet_id LIMIT 1",
+        (time.time(), *exclude_targets),
+    ).fetchone()
+    return dict(row) if row else None
+
+
+def next_outbox_attempt() -> float | None:
+    row = _db().execute("SELECT MIN(next_attempt_at) AS t FROM outbox WHERE dead = 0").fetchone()
+    return row["t"] if row else None
+
+
+def complete_outbox(tweet_id, target: str, post_uri: str | None, post_cid: str | None,
+                    root: tuple | None = None, tail: tuple | None = None) -> None:
+    _write_many([
+        ("DELETE FROM outbox WHERE tweet_id = ?", (int(tweet_id),)),
+        _upsert_tweet_sql(tweet_id, target, STATUS_POSTED, post_uri, post_cid, root, tail),
+        _advance_watermark_sql(target, tweet_id),
+    ])
+
+
+def retry_outbox(tweet_id, error: str, delay: float) -> None:
+    _write(
+        "UPDATE outbox SET attempts = attempts + 1, next_attempt_at = ?, last_error = ? WHERE tweet_id = ?",
+        (time.time() + delay, error, int(tweet_id)),
+    )
+
+
+def dead_letter_outbox(tweet_id, target: str, error: str) -> None:
+    _write_many([
+        (
+            "UPDATE outbox SET attempts = attempts + 1, dead = 1, last_error = ? WHERE tweet_id = ?",
+            (error, int(tweet_id)),
+        ),
+        _upsert_tweet_sql(tweet_id, target, STATUS_FAILED, None, None),
+    ])
+
+
+def outbox_depth() -> dict:
+    row = _db().execute(
+        "SELECT SUM(dead = 0) AS queued, SUM(dead = 1) AS dead FROM outbox"
+    ).fetchone()
+    return {"queued": row["queued"] or 0, "dead": row["dead"] or 0}
+
+
+def import_state_targets(targets: dict) -> int:
+    # One-time migration of {"username": {"last_tweet_id": "..."}} from state.json
+    imported = 0
+    for username, target_state in targets.items():
+        last_tweet_id = (target_state or {}).get("last_tweet_id")
+        if last_tweet_id is None or get_last_tweet_id(username) is not None:
+            continue
+        try:
+            set_last_tweet_id(username, last_tweet_id)
+            imported += 1
+        except ValueError:
+            logging.warning(f"Ignoring invalid last_tweet_id {last_tweet_id!r} for '{username}'")
+    return imported
+
+
+def get_translation(cache_key: str, max_age: float) -> tuple[str, float] | None:
+    # Returns (translation, created_at) if cached and younger than max_age seconds
+    row = _db().execute(
+        "SELECT translation, created_at FROM translations WHERE cache_key = ? AND created_at >= ?",
+        (cache_key, time.time() - max_age),
+    ).fetchone()
+    return (row["translation"], row["created_at"]) if row else None
+
+
+def put_translation(cache_key: str, translation: str, created_at: float | None = None) -> None:
+    _write(
+        "INSERT OR REPLACE INTO translations (cache_key, translation, created_at) VALUES (?, ?, ?)",
+        (cache_key, translation, created_at if created_at is not None else time.time()),
+    )
+
+
+def prune_translations(max_age: float) -> int:
+    conn = _db()
+    with _lock:
+        cursor = conn.execute("DELETE FROM translations WHERE created_at < ?", (time.time() - max_age,))
+    return cursor.rowcount
+
+
+def get_cached_user(handle: str, max_age: float) -> dict | None:
+    row = _db().execute(
+        "SELECT * FROM users WHERE handle = ? AND fetched_at >= ?",
+        (handle.lower(), time.time() - max_age),
+    ).fetchone()
+    return dict(row) if row else None
+
+
+def put_cached_user(handle: str, user_id: str, name: str | None = None, fetched_at: float | None = None) -> None:
+    _write(
+        "INSERT OR REPLACE INTO users (handle, user_id, name, fetched_at) VALUES (?, ?, ?, ?)",
+        (handle.lower(), str(user_id), name, fetched_at if fetched_at is not None else time.time()),
+    )
+
+
+def delete_cached_user(handle: str) -> None:
+    _write("DELETE FROM users WHERE handle = ?", (handle.lower(),))
+
+
+def get_cached_mentions() -> dict[str, tuple[str | None, float]]:
+    # Bluesky handle -> (DID, resolved at); a None DID records a handle that did not resolve
+    rows = _db().execute("SELECT handle, did, resolved_at FROM mentions").fetchall()
+    return {row["handle"]: (row["did"], row["resolved_at"]) for row in rows}
+
+
+def put_cached_mentions(resolved: dict[str, str | None], resolved_at: float | None = None) -> None:
+    resolved_at = resolved_at if resolved_at is not None else time.time()
+    _write_many([
+        ("INSERT OR REPLACE INTO mentions (handle, did, resolved_at) VALUES (?, ?, ?)", (handle.lower(), did, resolved_at))
+        for handle, did in resolved.items()
+    ])
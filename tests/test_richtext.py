@@ -0,0 +1,59 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import richtext
+
+ROUTES = {"fcb": "@fcb-mirror.bsky.social", "rma": "@rma-mirror.bsky.social"}
+
+
+def route(tokens: list) -> list:
+    # What main.route_mentions does for mapped handles, without a Bluesky client
+    return [("mention", ROUTES[value.lower()], value) if kind == "mention" else (kind, display, value)
+            for kind, display, value in tokens]
+
+
+class SplitTokensTest(unittest.TestCase):
+    def test_routed_mentions_longer_than_the_tweet(self):
+        # 263 graphemes as a tweet, about 570 once both handles become Bluesky handles
+        text = "El Clásico tonight! @FCB vs @RMA " * 8
+        tokens = route(richtext.tokenize(text))
+        posts = richtext.split_tokens(tokens)
+
+        self.assertEqual(len(posts), 2)
+        for post in posts:
+            self.assertLessEqual(richtext.grapheme_count("".join(display for _, display, _ in post)),
+                                 richtext.MAX_GRAPHEMES)
+        # Every mention arrives whole, none is cut or dropped
+        mentions = [display for post in posts for kind, display, _ in post if kind == "mention"]
+        self.assertEqual(mentions, [ROUTES["fcb"], ROUTES["rma"]] * 8)
+
+    def test_long_word_is_cut_but_links_are_not(self):
+        text = "x" * 400 + " https://example.com/" + "a" * 50
+        posts = richtext.split_tokens(richtext.tokenize(text))
+
+        self.assertEqual([len(post[0][1].strip()) for post in posts], [300, 100])
+        self.assertEqual(posts[1][-1][0], "link")
+
+    def test_token_longer_than_a_post_fails_validation(self):
+        tokens = [("mention", "@" + "a" * 400, "did:plc:x")]
+        with self.assertRaises(richtext.PostValidationError):
+            richtext.split_tokens(tokens)
+
+
+class TokenizeTest(unittest.TestCase):
+    def test_tco_links_expanded_or_dropped_in_one_scan(self):
+        urls = {"https://t.co/a": "https://example.com/story"}
+        tokens = richtext.tokenize("RT  see https://t.co/a, @bob\thttps://t.co/pic ", urls)
+
+        self.assertEqual(tokens, [
+            ("text", "🔁 see ", None),
+            ("link", "example.com/story", "https://example.com/story"),
+            ("text", ", ", None),
+            ("mention", "@bob", "bob"),
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
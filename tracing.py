@@ -0,0 +1,131 @@
+import asyncio
+import contextlib
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import time
+
+# Per-tweet traces, one JSON object per line. trace() opens a record for a tweet and
+# span() adds timed steps to whichever trace is current (a context variable, so spans
+# from gathered download/upload tasks land in the right trace). Finished records go
+# through a QueueHandler to a RotatingFileHandler on a background thread, so the event
+# loop never waits on disk. Without configure(), trace() and span() do nothing.
+#
+#   python benchmarks/analyze_traces.py data/traces.jsonl*
+
+_current: contextvars.ContextVar[dict | None] = contextvars.ContextVar("trace", default=None)
+_logger: logging.Logger | None = None
+_listener: logging.handlers.QueueListener | None = None
+
+
+class _Discard(dict):
+    # Attributes set on a span while tracing is off go nowhere
+    def __setitem__(self, key, value):
+        pass
+
+    def update(self, *args, **kwargs):
+        pass
+
+
+_noop = contextlib.nullcontext(_Discard())
+
+
+def configure(path: str, max_bytes: int = 10 * 1024 * 1024, backups: int = 3) -> None:
+    global _logger, _listener
+    if _logger is not None:
+        return
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    records = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(records, handler)
+    _listener.start()
+
+    _logger = logging.getLogger("t2b.traces")
+    _logger.setLevel(logging.INFO)
+    _logger.propagate = False
+    _logger.addHandler(logging.handlers.QueueHandler(records))
+    logging.info(f"Writing tweet traces to {path}")
+
+
+def shutdown() -> None:
+    # Flushes queued traces to disk
+    global _logger, _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _logger is not None:
+        _logger.handlers.clear()
+        _logger = None
+
+
+def enabled() -> bool:
+    return _logger is not None
+
+
+@contextlib.contextmanager
+def trace(trace_id, **attrs):
+    # Yields the trace record; set record["outcome"] before leaving the block
+    if _logger is None:
+        yield _Discard()
+        return
+    record = {"trace_id": str(trace_id), "start": time.time(), **attrs, "spans": []}
+    token = _current.set(record)
+    started = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record.setdefault("outcome", "cancelled" if isinstance(e, asyncio.CancelledError) else "error")
+        record.setdefault("error", str(e) or type(e).__name__)
+        raise
+    finally:
+        _current.reset(token)
+        record["duration"] = round(time.perf_counter() - started, 6)
+        record.setdefault("outcome", "ok")
+        logger = _logger
+        if logger is not None:
+            logger.info(json.dumps(record, default=str, ensure_ascii=False))
+
+
+class _Span:
+    __slots__ = ("record", "data", "started")
+
+    def __init__(self, record: dict, name: str, attrs: dict):
+        self.record = record
+        self.data = {"name": name, **attrs}
+
+    def __enter__(self) -> dict:
+        self.data["offset"] = round(time.time() - self.record["start"], 6)
+        self.started = time.perf_counter()
+        return self.data
+
+    def __exit__(self, exc_type, exc, tb):
+        self.data["duration"] = round(time.perf_counter() - self.started, 6)
+        if exc_type is None:
+            self.data.setdefault("outcome", "ok")
+        else:
+            self.data["outcome"] = "error"
+            self.data["error"] = str(exc) or exc_type.__name__
+        self.record["spans"].append(self.data)
+        return False
+
+
+def span(name: str, **attrs):
+    # with tracing.span("upload", media_type="video") as s: s["bytes"] = size
+    record = _current.get()
+    return _Span(record, name, attrs) if record is not None else _noop
+
+
+def add_span(name: str, started: float, duration: float, **attrs) -> None:
+    # A step timed outside the current trace, such as the poll that found the tweet.
+    # started is a time.time() value; the offset is negative if it ran before the trace.
+    record = _current.get()
+    if record is not None:
+        record["spans"].append({
+            "name": name,
+            **attrs,
+            "offset": round(started - record["start"], 6),
+            "duration": round(duration, 6),
+            "outcome": "ok",
+        })
@@ -0,0 +1,190 @@
+import abc
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+
+import httpx
+
+import store
+
+# Translation backends and cache.
+#
+# Backends share one interface (async translate(text, from_lang, to_lang)). The default
+# RapidAPI backend keeps a single pooled httpx.AsyncClient, so concurrent translations
+# reuse connections; TRANSLATION_API_URL can point it at a local stand-in server and
+# TRANSLATION_BACKEND=dictionary swaps in an offline lookup table for tests/benchmarks.
+#
+# The cache is keyed on (sha256 of text, from, to): an in-memory LRU in front of the
+# SQLite translations table. Both layers expire entries after a TTL.
+
+RAPIDAPI_URL = "https://free-google-translator.p.rapidapi.com/external-api/free-google-translator"
+RAPIDAPI_HOST = "free-google-translator.p.rapidapi.com"
+
+LRU_SIZE = 512
+DEFAULT_TTL = 30 * 86400
+
+_lru: OrderedDict[str, tuple[str, float]] = OrderedDict()
+_stats = {"hits": 0, "misses": 0}
+
+
+class TranslationError(Exception):
+    pass
+
+
+class TranslationBackend(abc.ABC):
+    name = "base"
+
+    @abc.abstractmethod
+    async def translate(self, text: str, from_lang: str, to_lang: str) -> str | None:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+class RapidApiBackend(TranslationBackend):
+    name = "rapidapi"
+
+    def __init__(self, url: str = RAPIDAPI_URL, api_key: str | None = None, timeout: float = 15,
+                 max_connections: int = 10):
+        self.url = url
+        self.api_key = api_key
+        self._http = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    async def translate(self, text: str, from_lang: str, to_lang: str) -> str | None:
+        if not self.api_key:
+            raise TranslationError("TRANSLATOR_RAPIDAPI_KEY is not set.")
+        headers = {
+            "x-rapidapi-key": self.api_key,
+            "x-rapidapi-host": RAPIDAPI_HOST,
+            "Content-Type": "application/json",
+        }
+        response = await self._http.post(
+            self.url,
+            json={"translate": "rapidapi"},
+            headers=headers,
+            params={"from": from_lang, "to": to_lang, "query": text},
+        )
+        if response.status_code != 200:
+            raise TranslationError(f"Translation API returned status code {response.status_code}")
+        return response.json().get("translation", "")
+
+    async def close(self) -> None:
+        await self._http.aclose()
+
+
+class DictionaryBackend(TranslationBackend):
+    # Offline backend. The JSON file maps "from:to" to {phrase: translation}; whole
+    # phrases are matched first, then words are replaced one by one.
+    name = "dictionary"
+
+    def __init__(self, entries: dict[str, dict[str, str]] | None = None, path: str | None = None):
+        self.entries = entries or {}
+        if path:
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    async def translate(self, text: str, from_lang: str, to_lang: str) -> str | None:
+        table = {k.lower(): v for k, v in self.entries.get(f"{from_lang}:{to_lang}", {}).items()}
+        if not table:
+            return None
+        if text.lower() in table:
+            return table[text.lower()]
+        return re.sub(r"\w+", lambda m: table.get(m.group(0).lower(), m.group(0)), text)
+
+
+_backend: TranslationBackend | None = None
+
+
+def create_backend(config: dict) -> TranslationBackend:
+    # config is the dict from main.load_config
+    backend = (config.get("translation_backend") or "rapidapi").lower()
+    if backend == "dictionary":
+        return DictionaryBackend(path=config.get("translation_dictionary_file"))
+    if backend != "rapidapi":
+        logging.warning(f"Unknown TRANSLATION_BACKEND '{backend}', using rapidapi")
+    return RapidApiBackend(url=config.get("translation_api_url") or RAPIDAPI_URL, api_key=config.get("translator_rapidapi_key"))
+
+
+def get_backend(config: dict) -> TranslationBackend:
+    # Created on first use and kept until close_backend (main closes it when a reload
+    # changes any translation setting)
+    global _backend
+    if _backend is None:
+        _backend = create_backend(config)
+        logging.info(f"Using {_backend.name} translation backend")
+    return _backend
+
+
+async def close_backend() -> None:
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
+
+
+def cache_key(text: str, from_lang: str, to_lang: str) -> str:
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{digest}:{from_lang}:{to_lang}"
+
+
+def _remember(key: str, translation: str, created_at: float) -> None:
+    _lru[key] = (translation, created_at)
+    _lru.move_to_end(key)
+    while len(_lru) > LRU_SIZE:
+        _lru.popitem(last=False)
+
+
+def get_cached(text: str, from_lang: str, to_lang: str, ttl: float = DEFAULT_TTL) -> str | None:
+    key = cache_key(text, from_lang, to_lang)
+    entry = _lru.get(key)
+    if entry and time.time() - entry[1] <= ttl:
+        _lru.move_to_end(key)
+        _stats["hits"] += 1
+        return entry[0]
+    _lru.pop(key, None)
+
+    try:
+        row = store.get_translation(key, ttl)
+    except RuntimeError:
+        # Store not initialized (benchmarks); the in-memory layer still works
+        row = None
+    if row:
+        _remember(key, *row)
+        _stats["hits"] += 1
+        return row[0]
+
+    _stats["misses"] += 1
+    return None
+
+
+def put_cached(text: str, from_lang: str, to_lang: str, translation: str) -> None:
+    key = cache_key(text, from_lang, to_lang)
+    now = time.time()
+    _remember(key, translation, now)
+    try:
+        store.put_translation(key, translation, now)
+    except RuntimeError:
+        pass
+    except Exception as e:
+        logging.warning(f"Could not persist translation cache entry: {e}")
+
+
+def prune(ttl: float = DEFAULT_TTL) -> int:
+    now = time.time()
+    for key in [k for k, (_, created_at) in _lru.items() if now - created_at > ttl]:
+        del _lru[key]
+    return store.prune_translations(ttl)
+
+
+def stats_summary() -> str:
+    hits, misses = _stats["hits"], _stats["misses"]
+    total = hits + misses
+    rate = (hits / total * 100) if total else 0.0
+    return f"Translation cache: {hits} hit(s), {misses} miss(es), {rate:.0f}% hit rate, {hits} API call(s) saved"